@@ -0,0 +1,408 @@
+# =============================================================================
+# Backtracking Word Search
+#
+# Placement strategy that searches instead of guessing. Every legal start
+# position of a word is visited (in a seeded pseudo-random order), so a
+# word is only given up on when it truly does not fit. When that happens
+# the search backjumps to the most recent word that blocks it, which is
+# conflict-directed backjumping. This keeps the search complete: it either
+# places every word, proves the words cannot all be placed, or runs out of
+# its time budget. The next word is always the most constrained one, with
+# the fewest valid placements on the grid so far. When the search gives
+# up, the deepest arrangement it reached is put back and the words left
+# over are placed greedily, within what's left of the budget.
+#
+# Placements are counted with bitwise operations over every line of the
+# grid, so choosing words costs more as grids grow: a 120x120 puzzle takes
+# about 0.5 s and a 300x300 one about 20 s, where there is little to
+# search for. Sparse grids are better served by WordSearch.
+# =============================================================================
+
+import array
+import bisect
+import functools
+import heapq
+import math
+import time
+
+from Solver import gridLines
+from WordSearch import WordSearch, WordLocations, DIRECTIONS, startRegions
+
+@functools.lru_cache(maxsize=64)
+def linePositions(size):
+    """Lays the rows, columns and diagonals of a size x size grid (see
+    Solver.gridLines) end to end, one position per cell and a gap between
+    lines. Returns the 4 positions of each cell, flattened, and a mask
+    with a bit set at every cell's positions."""
+
+    positions = array.array("L", [0])*(4*size*size)
+    filled = [0]*(size*size)
+    position = 0
+    mask = 0
+    for cells, direction in gridLines(size):
+        line = range(size*size)[cells]
+        for offset in line:
+            positions[4*offset + filled[offset]] = position
+            filled[offset] += 1
+            position += 1
+        #len(line) ones, then the gap
+        mask |= ((1 << len(line)) - 1) << (position - len(line))
+        position += 1
+    return positions, mask
+
+
+class BacktrackWordSearch(WordSearch):
+    """WordSearch whose placeWords places all of wordsToFind or proves it
+    can't, within timeBudget seconds. After buildArray, searchResult is
+    'placed', 'impossible' or 'timeout', and backjumps is the number of
+    times the search had to undo placed words. On 'impossible' or
+    'timeout' the grid holds the deepest arrangement the search reached,
+    plus whatever words WordSearch.placeWords could add to it."""
+
+    #Share of timeBudget kept back for placing greedily the words left over
+    #when the search times out
+    topUpShare = 0.25
+
+    def __init__(self, seed=None, stats=None, timeBudget=10, wordSource=None):
+        super().__init__(seed, stats, wordSource)
+        self.timeBudget = timeBudget
+
+
+    def startPositions(self, word):
+        """Returns the legal start rectangles of word as a list of
+        (firstIndex, direction, startRow, rows, startColumn, columns), where
+        firstIndex is the number of start positions in earlier rectangles,
+        and the total number of start positions"""
+
+        rectangles = []
+        total = 0
+        regions = startRegions(self.size, len(word))
+        for direction in DIRECTIONS:
+            if regions[direction] is None:
+                continue
+            firstRow, lastRow, firstColumn, lastColumn = regions[direction]
+            rows = lastRow - firstRow + 1
+            columns = lastColumn - firstColumn + 1
+            rectangles.append((total, direction, firstRow, rows, firstColumn, columns))
+            total += rows*columns
+        return rectangles, total
+
+
+    def candidates(self, word):
+        """Yields every legal (direction, row, column) for word exactly once,
+        in an order drawn from self.rng. The order is the affine permutation
+        i -> (offset + step*i) mod total, so nothing is materialized."""
+
+        rectangles, total = self.startPositions(word)
+        if not total:
+            return
+        firstIndexes = [rectangle[0] for rectangle in rectangles]
+
+        step = self.rng.randrange(1, total + 1)
+        while math.gcd(step, total) != 1:
+            step = self.rng.randrange(1, total + 1)
+        offset = self.rng.randrange(total)
+
+        for i in range(total):
+            index = (offset + step*i) % total
+            firstIndex, direction, startRow, rows, startColumn, columns = \
+                rectangles[bisect.bisect_right(firstIndexes, index) - 1]
+            row, column = divmod(index - firstIndex, columns)
+            yield direction, startRow + row, startColumn + column
+
+
+    def conflictDepth(self, word, direction, row, column):
+        """For a placement rejected by checkValidPlacement, returns the depth
+        of the earliest placed word that alone rules it out"""
+
+        rowStep, columnStep = DIRECTIONS[direction]
+        cells = self.hidden[self.cellSlice(word, direction, row, column)]
+        earliest = None
+        for i, (placed, code) in enumerate(zip(cells, word.encode())):
+            if placed and placed != code:
+                coordPair = (row + rowStep*i, column + columnStep*i)
+                depth = self.cellOwners[coordPair][0]
+                if earliest is None or depth < earliest:
+                    earliest = depth
+        return earliest
+
+
+    def placeAt(self, depth, word, direction, row, column):
+        """placeWord, also recording what's needed to undo the placement"""
+
+        cells = self.cellSlice(word, direction, row, column)
+        previousLetters = self.letters[cells]
+        for offset, placed, code in zip(range(self.size*self.size)[cells],
+                                        self.hidden[cells], word.encode()):
+            if not placed:
+                self.fillEvents += 1
+                self.setCell(offset, code)
+        self.gridVersion += 1
+        self.placeWord(word, direction, row, column)
+        self.previousLetters[depth] = previousLetters
+        for coordPair in self.wordLocations[word]:
+            self.cellOwners.setdefault(coordPair, []).append(depth)
+
+
+    def unplace(self, depth, word):
+        """Undoes placeAt. Words are always undone in the reverse order of
+        placement, so everything to undo is at the end of its list."""
+
+        self.gridVersion += 1
+        coordPairs = self.wordLocations.pop(word)
+        self.wordsAdded.pop()
+        previousLetters = self.previousLetters.pop(depth)
+        for coordPair, letter, previous in zip(reversed(coordPairs), reversed(word),
+                                               reversed(previousLetters)):
+            owners = self.cellOwners[coordPair]
+            owners.pop()
+            if not owners:
+                del self.cellOwners[coordPair]
+                row, column = coordPair
+                offset = row*self.size + column
+                self.setCell(offset, 0)
+                self.hidden[offset] = 0
+                self.letters[offset] = previous
+                self.indexedCoords.discard(coordPair)
+                self.letterCoords[letter].pop()
+
+
+    def setCell(self, offset, code):
+        """Updates emptyBits and letterBits, the masks of the line positions
+        of empty cells and of the cells holding each code, for the cell at
+        offset getting code. Code 0 empties the cell, which must still
+        hold its code in hidden."""
+
+        start = 4*offset
+        a, b, c, d = self.linePositions[start:start + 4]
+        bits = (1 << a) | (1 << b) | (1 << c) | (1 << d)
+        self.emptyBits ^= bits
+        if not code:
+            code = self.hidden[offset]
+        self.letterBits[code] = self.letterBits.get(code, 0) ^ bits
+
+
+    def countStarts(self, word):
+        """Number of valid placements of word on the current grid. Bit p of
+        letterMask(code) is set where the cell at position p of the lines
+        (see linePositions) holds code or is empty, so word can be read
+        from p along its line where the masks of its letters, each shifted
+        back by the letter's index, all have bit p set. The reversed word
+        gives the placements read against the line."""
+
+        forwards = backwards = -1
+        last = len(word) - 1
+        for i, code in enumerate(word.encode()):
+            mask = self.letterMask(code)
+            forwards &= mask >> i
+            backwards &= mask >> (last - i)
+        return forwards.bit_count() + backwards.bit_count()
+
+
+    def letterMask(self, code):
+        """Mask of the line positions whose cell is empty or holds code"""
+
+        if self.masksVersion != self.gridVersion:
+            self.masks = {}
+            self.masksVersion = self.gridVersion
+        mask = self.masks.get(code)
+        if mask is None:
+            mask = self.masks[code] = self.emptyBits | self.letterBits.get(code, 0)
+        return mask
+
+
+    def pushWord(self, word):
+        """Makes word a candidate for chooseWord again. Words are kept in a
+        heap per length, keyed so that the top of each heap has the
+        smallest lower bound on its valid placements (see chooseWord)."""
+
+        count, fillEvents, version = self.startCounts[word]
+        length = len(word)
+        heapq.heappush(self.heaps.setdefault(length, []),
+                       (count + 8*length*fillEvents, self.positions[word], word))
+
+
+    def chooseWord(self):
+        """Returns the unplaced word with the fewest valid placements on the
+        current grid, the longest such word on ties, and stops offering it.
+
+        Counting a word's placements scans the grid, so each count is kept
+        with the fillEvents and gridVersion it was made at. Undoing words
+        only adds placements, and each cell filled since can rule out at
+        most 8*len(word) of them (one per direction and letter), so
+        count - 8*len(word)*(fills since) is a lower bound on the current
+        count. Words are recounted in order of that bound until it reaches
+        the best exact count, which in a sparse grid is only a few."""
+
+        best = None #(count, -length, position, word)
+        popped = set()
+        while True:
+            top = None
+            for length, heap in self.heaps.items():
+                #Drop entries of placed words and superseded counts
+                while heap:
+                    key, position, word = heap[0]
+                    count, fillEvents, version = self.startCounts[word]
+                    if (word in self.unplaced and word not in popped and
+                        key == count + 8*length*fillEvents):
+                        break
+                    heapq.heappop(heap)
+                if heap:
+                    bound = heap[0][0] - 8*length*self.fillEvents
+                    if top is None or (bound, -length) < top[:2]:
+                        top = (bound, -length, heap)
+            if top is None or (best is not None and top[0] >= best[0]):
+                break
+
+            key, position, word = heapq.heappop(top[2])
+            popped.add(word)
+            count, fillEvents, version = self.startCounts[word]
+            if version != self.gridVersion:
+                count = self.countStarts(word)
+                self.startCounts[word] = (count, self.fillEvents, self.gridVersion)
+            if best is None or (count, -len(word), position) < best[:3]:
+                best = (count, -len(word), position, word)
+
+        word = best[3]
+        self.unplaced.discard(word)
+        for other in popped - {word}:
+            self.pushWord(other)
+        return word
+
+
+    def placeWords(self):
+        """Places every word in wordsToFind by depth-first search with
+        conflict-directed backjumping, choosing the most constrained word
+        next: the one with the fewest valid placements (see chooseWord).
+        Sets searchResult and leaves words that weren't placed in
+        wordsToFind.
+
+        If the search gives up, the deepest arrangement it reached replaces
+        the one it ended on, which after a backjump can be much shallower,
+        and WordSearch.placeWords adds what it can of the remaining words.
+        The search gets all but topUpShare of timeBudget, so that both fit
+        in the budget."""
+
+        start = time.perf_counter()
+        deadline = start + self.timeBudget
+        searchDeadline = start + self.timeBudget*(1 - self.topUpShare)
+        stats = self.stats
+        words = self.wordsToFind[:]
+        self.cellOwners = {} #coord -> depths of the placed words covering it
+        self.previousLetters = {} #depth -> codes in letters before placing
+        self.backjumps = 0
+
+        #Placement counts start as the number of legal start positions,
+        #which is exact while the grid is empty
+        self.fillEvents = 0 #cells filled by placeAt so far, never undone
+        self.gridVersion = 0 #changes on every placeAt and unplace
+        self.linePositions, self.emptyBits = linePositions(self.size)
+        self.letterBits = {} #code -> bits of the positions holding it
+        for offset, code in enumerate(self.hidden):
+            if code:
+                self.setCell(offset, code)
+        self.masksVersion = None
+        self.positions = {word: position for position, word in enumerate(words)}
+        version = 0 if not any(self.hidden) else None
+        self.startCounts = {word: (self.startPositions(word)[1], 0, version)
+                            for word in words}
+        self.heaps = {} #word length -> heap of words to choose from
+        self.unplaced = set(words)
+        for word in words:
+            self.pushWord(word)
+
+        order = [None]*len(words) #depth -> word chosen there
+        iterators = [None]*len(words)
+        conflicts = [set() for word in words]
+        placements = [None]*len(words) #depth -> (word, direction, row, column)
+        deepest = [] #placements of the deepest arrangement reached
+
+        depth = 0
+        checks = 0
+        self.searchResult = "placed"
+        while depth < len(words):
+            if order[depth] is None:
+                order[depth] = self.chooseWord()
+                iterators[depth] = self.candidates(order[depth])
+            word = order[depth]
+
+            placed = False
+            for direction, row, column in iterators[depth]:
+                if stats is not None:
+                    stats.recordAttempt("backtrack")
+                if self.checkValidPlacement(word, direction, row, column):
+                    self.placeAt(depth, word, direction, row, column)
+                    placements[depth] = (word, direction, row, column)
+                    placed = True
+                    break
+                if stats is not None:
+                    stats.recordRejection("conflict", direction)
+                conflicts[depth].add(self.conflictDepth(word, direction, row, column))
+
+                checks += 1
+                if not checks % 4096 and time.perf_counter() > searchDeadline:
+                    break
+
+            if placed:
+                if stats is not None:
+                    stats.recordPlacement("backtrack")
+                depth += 1
+                if depth > len(deepest):
+                    deepest = placements[:depth]
+                continue
+
+            if time.perf_counter() > searchDeadline:
+                self.searchResult = "timeout"
+                break
+
+            #No placed word blocks this word, so it can't fit in any
+            #arrangement of the words before it
+            if not conflicts[depth]:
+                self.searchResult = "impossible"
+                break
+
+            #Jump back to the latest word that blocks this one. The words
+            #after it are chosen afresh once it has moved.
+            jumpTo = max(conflicts[depth])
+            conflicts[jumpTo] |= conflicts[depth] - {jumpTo}
+            for undoDepth in range(depth, jumpTo - 1, -1):
+                if undoDepth < depth:
+                    self.unplace(undoDepth, order[undoDepth])
+                if undoDepth > jumpTo:
+                    self.unplaced.add(order[undoDepth])
+                    self.pushWord(order[undoDepth])
+                    order[undoDepth] = None
+                    iterators[undoDepth] = None
+                    conflicts[undoDepth] = set()
+            self.backjumps += 1
+            depth = jumpTo
+
+        if self.searchResult == "placed":
+            self.wordsToFind = []
+            return
+
+        #Undo back to the fill letters, put back the deepest arrangement
+        #and let greedy placement try the words the search didn't get to
+        for undoDepth in range(depth - 1, -1, -1):
+            self.unplace(undoDepth, order[undoDepth])
+        self.replay(bytes(self.letters), deepest)
+        self.wordsToFind = [word for word in words if word not in self.wordLocations]
+        WordSearch.placeWords(self, deadline)
+
+
+    def replay(self, fillLetters, arrangement):
+        """Clears the grid back to fillLetters and places arrangement, a
+        list of (word, direction, row, column), without recording it in
+        stats"""
+
+        self.letters = bytearray(fillLetters)
+        self.hidden = bytearray(len(fillLetters))
+        self.wordsAdded = []
+        self.wordLocations = WordLocations(self.size)
+        self.letterCoords = {}
+        self.indexedCoords = set()
+
+        stats, self.stats = self.stats, None
+        for word, direction, row, column in arrangement:
+            self.placeWord(word, direction, row, column)
+        self.stats = stats
@@ -0,0 +1,125 @@
+# =============================================================================
+# Word Search Batch Generation
+#
+# Headless API for generating many puzzles at once, e.g. for puzzle books.
+# Generation is spread over a process pool, and nothing is printed.
+# generateMany returns a list; iterPuzzles streams any number of puzzles
+# while holding only a few chunks of them in memory. wordList is the path of
+# a custom word list to sample words from instead of Dictionary.txt, read
+# through WordSource.MappedWordList so lists of any size can be used.
+# =============================================================================
+
+import collections
+import itertools
+import multiprocessing
+import os
+import random
+
+from WordSearch import WordSearch
+from WordSource import getMappedWordList
+
+def buildWordSearch(size, seed=None, fill="uniform", wordList=None, density=1):
+    """Returns a WordSearch that has generated a size x size word search,
+    without printing it"""
+
+    wordSource = getMappedWordList(wordList) if wordList is not None else None
+    ws = WordSearch(seed, wordSource=wordSource)
+    ws.buildArray(size, verbose=False, density=density, fill=fill)
+    return ws
+
+
+def buildPuzzle(size, seed=None, fill="uniform", wordList=None):
+    """Generates a single size x size Puzzle without printing it. The same
+    size, seed, fill and word list always give the same Puzzle."""
+
+    return buildWordSearch(size, seed, fill, wordList).toPuzzle()
+
+
+def buildPuzzles(tasks):
+    """buildPuzzle for each (size, seed, fill, wordList) in tasks"""
+
+    return [buildPuzzle(*task) for task in tasks]
+
+
+def puzzleTasks(sizes, count, seed, fill, wordList=None):
+    """Yields (size, seed, fill, wordList) for count puzzles of each size,
+    with every puzzle's seed drawn from seed"""
+
+    if isinstance(sizes, int):
+        sizes = [sizes]
+    seeds = random.Random(seed)
+    for size in sizes:
+        for i in range(count):
+            yield size, seeds.getrandbits(64), fill, wordList
+
+
+def generateMany(sizes, count, workers=None, seed=None, fill="uniform",
+                 wordList=None):
+    """Generates count puzzles for each size in sizes (a single size is also
+    accepted) and returns them as a list of Puzzles, grouped by size in the
+    order given. workers is the number of processes to use, defaulting to
+    the number of CPUs; workers=1 generates in this process.
+
+    Every puzzle gets its own seed, drawn from seed, so the whole batch can
+    be reproduced from seed and any single puzzle from its Puzzle.seed."""
+
+    tasks = list(puzzleTasks(sizes, count, seed, fill, wordList))
+    if wordList is not None:
+        getMappedWordList(wordList) #index it once, before the workers start
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(tasks) <= 1:
+        return buildPuzzles(tasks)
+
+    #Each worker loads the word index once and reuses it for every puzzle
+    #it builds, so hand out tasks in chunks to keep IPC overhead low
+    chunksize = max(1, len(tasks) // (4*workers))
+    with multiprocessing.Pool(workers) as pool:
+        return pool.starmap(buildPuzzle, tasks, chunksize)
+
+
+def starmapChunk(function, chunk):
+    return [function(*arguments) for arguments in chunk]
+
+
+def iterStarmap(function, tasks, workers=None, chunksize=32):
+    """Yields function(*task) for each of tasks (any iterable), in order,
+    as the results are ready. Tasks are handed to a pool of workers
+    processes chunksize at a time, and at most 2*workers chunks are worked
+    on ahead of the consumer, so memory stays bounded however many tasks
+    there are. workers=1 runs in this process. Closing the generator early
+    stops the pool."""
+
+    tasks = iter(tasks)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1:
+        for task in tasks:
+            yield function(*task)
+        return
+
+    #Pool.imap would read every task up front and keep finished results
+    #until they're consumed. Instead, a chunk is only submitted once an
+    #earlier one has been handed on.
+    chunks = iter(lambda: list(itertools.islice(tasks, chunksize)), [])
+    pending = collections.deque()
+    with multiprocessing.Pool(workers) as pool:
+        for chunk in chunks:
+            pending.append(pool.apply_async(starmapChunk, (function, chunk)))
+            if len(pending) >= 2*workers:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
+
+
+def iterPuzzles(sizes, count, workers=None, seed=None, fill="uniform",
+                chunksize=32, wordList=None):
+    """Yields the same puzzles as generateMany, in the same order, as they
+    are generated, holding only a few chunks of chunksize puzzles in
+    memory (see iterStarmap)."""
+
+    tasks = puzzleTasks(sizes, count, seed, fill, wordList)
+    if wordList is not None:
+        getMappedWordList(wordList) #index it once, before the workers start
+    return iterStarmap(buildPuzzle, tasks, workers, chunksize)
@@ -0,0 +1,185 @@
+# =============================================================================
+# Word Search Generator Benchmark
+#
+# Runs WordSearch.buildArray over grid sizes, word densities, placement
+# engines and fill strategies with fixed seeds, and reports latency,
+# placement success, the attempts spent in genRandomPlacement and
+# genOverlapPlacement and the fill time per cell. With --check, every puzzle
+# is also solved to count the words in it that weren't hidden. The JSON
+# report also has the full PlacementStats for each run.
+#
+# Usage: python Benchmark.py [--sizes 10 25 40 55 80 120] [--runs 20]
+#                            [--densities 1] [--engines default backtrack numpy]
+#                            [--fills uniform clean] [--check]
+#                            [--seed 0] [--json results.json]
+#                            [--compare old_results.json]
+# =============================================================================
+
+import argparse
+import json
+import platform
+import statistics
+import time
+
+from Metrics import percentile
+from PlacementStats import PlacementStats
+from Solver import checkPuzzle
+from WordIndex import getWordIndex
+from BacktrackWordSearch import BacktrackWordSearch
+from WordSearch import WordSearch, FILLS
+
+ENGINES = {"default": WordSearch, "backtrack": BacktrackWordSearch}
+
+#The NumPy engine is optional
+try:
+    from NumpyWordSearch import NumpyWordSearch
+    ENGINES["numpy"] = NumpyWordSearch
+except ImportError:
+    pass
+
+def benchmarkBuildArray(size, runs, engine=WordSearch, density=1, seed=0,
+                        fill="uniform", check=False):
+    """Builds runs puzzles of size, run i from seed + i, and returns a dict
+    of results. Times are in milliseconds; other values are per puzzle.
+    With check, meanExtraWords is the mean number of words of 3 or more
+    letters found in a puzzle other than its hidden words."""
+
+    times = []
+    placed = []
+    leftover = []
+    extraWords = []
+    stats = PlacementStats()
+    for run in range(runs):
+        ws = engine(seed + run, stats)
+        start = time.perf_counter()
+        ws.buildArray(size, verbose=False, density=density, fill=fill)
+        times.append(time.perf_counter() - start)
+
+        placed.append(len(ws.wordsAdded))
+        leftover.append(len(ws.wordsToFind))
+        if check:
+            result = checkPuzzle(ws.toPuzzle())
+            extraWords.append(len(result["duplicates"]) + len(result["extras"]))
+
+    report = {
+        "size": size,
+        "density": density,
+        "fill": fill,
+        "runs": runs,
+        "targetWords": ws.numWordsToFind,
+        "p50Ms": 1000*percentile(times, 50),
+        "p95Ms": 1000*percentile(times, 95),
+        "meanMs": 1000*statistics.mean(times),
+        "wordsPerSecond": sum(placed)/sum(times),
+        "meanPlaced": statistics.mean(placed),
+        "meanLeftover": statistics.mean(leftover),
+        "maxLeftover": max(leftover),
+        "meanRandomAttempts": stats.attempts.get("random", 0)/runs,
+        "meanOverlapAttempts": stats.attempts.get("overlap", 0)/runs,
+        "fillNsPerCell": 1e9*stats.phases["fill"]/(runs*size*size),
+        "stats": stats.asDict(),
+    }
+    if check:
+        report["meanExtraWords"] = statistics.mean(extraWords)
+    return report
+
+
+def runSuite(sizes, runs, engines, densities, seed, fills=("uniform",),
+             check=False):
+    """Runs benchmarkBuildArray for every engine, fill, density and size,
+    printing each result. Returns the machine-readable report written by
+    --json."""
+
+    results = []
+    for engineName in engines:
+        for fill in fills:
+            for density in densities:
+                for size in sizes:
+                    result = benchmarkBuildArray(size, runs, ENGINES[engineName],
+                                                 density, seed, fill, check)
+                    result["engine"] = engineName
+                    results.append(result)
+                    printResult(result)
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "dictionaryVersion": getWordIndex().version,
+        "seed": seed,
+        "results": results,
+    }
+
+
+def resultKey(result):
+    #Reports from before fill strategies were added only used uniform fill
+    return (result["engine"], result.get("fill", "uniform"), result["density"],
+            result["size"])
+
+
+HEADER = ("{:>10}{:>8}{:>8}{:>6}{:>9}{:>9}{:>10}{:>8}{:>9}{:>10}{:>10}{:>13}{:>8}"
+          .format("engine", "fill", "density", "size", "p50 ms", "p95 ms",
+                  "words/s", "target", "leftover", "random", "overlap",
+                  "fill ns/cell", "extra"))
+
+ROW = ("{:>10}{:>8}{:>8}{:>6}{:>9.2f}{:>9.2f}{:>10.0f}{:>8}{:>9.2f}{:>10.1f}"
+       "{:>10.1f}{:>13.0f}{:>8}")
+
+def printResult(result):
+    print(ROW.format(result["engine"], result["fill"], result["density"],
+                     result["size"], result["p50Ms"], result["p95Ms"],
+                     result["wordsPerSecond"], result["targetWords"],
+                     result["meanLeftover"], result["meanRandomAttempts"],
+                     result["meanOverlapAttempts"], result["fillNsPerCell"],
+                     "{:.1f}".format(result["meanExtraWords"])
+                     if "meanExtraWords" in result else "-"))
+
+
+def printComparison(report, baseline):
+    """Prints p50 latency and leftover words against an earlier report"""
+
+    previous = {resultKey(result): result for result in baseline["results"]}
+    print("\nCompared with baseline:")
+    print("{:>10}{:>8}{:>8}{:>6}{:>12}{:>12}{:>10}{:>14}".format(
+        "engine", "fill", "density", "size", "old p50 ms", "new p50 ms",
+        "speedup", "leftover diff"))
+    for result in report["results"]:
+        old = previous.get(resultKey(result))
+        if old is None:
+            continue
+        print("{:>10}{:>8}{:>8}{:>6}{:>12.2f}{:>12.2f}{:>9.2f}x{:>+14.2f}".format(
+            result["engine"], result["fill"], result["density"], result["size"],
+            old["p50Ms"],
+            result["p50Ms"], old["p50Ms"]/result["p50Ms"],
+            result["meanLeftover"] - old["meanLeftover"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark buildArray")
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[10, 25, 40, 55, 80, 120])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--densities", type=float, nargs="+", default=[1.0])
+    parser.add_argument("--engines", nargs="+", choices=sorted(ENGINES),
+                        default=["default"])
+    parser.add_argument("--fills", nargs="+", choices=FILLS, default=["uniform"])
+    parser.add_argument("--check", action="store_true",
+                        help="count words in each puzzle that weren't hidden")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="results file from an earlier run")
+    args = parser.parse_args()
+
+    print(HEADER)
+    report = runSuite(args.sizes, args.runs, args.engines, args.densities,
+                      args.seed, args.fills, args.check)
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(report, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            printComparison(report, json.load(file))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+# =============================================================================
+# Best-of-N Generation
+#
+# Placement is random, so two puzzles of the same size can place quite
+# different numbers of words. buildBest generates up to N candidates of one
+# size across worker processes, within a wall-clock budget, and keeps the
+# one with the best score: the most words placed, then the most cells
+# shared between words, then the most even spread of directions. It also
+# returns the quality vs time curve, the best score after each candidate,
+# so CPU time can be traded for puzzle quality predictably.
+#
+# Usage: python BestOf.py --size 30 [--candidates 64] [--budget 2]
+#                         [--density 1.5] [--workers 4] [--seed 0]
+#                         [--fill clean] [--words FILE] [--json FILE]
+# =============================================================================
+
+import argparse
+import collections
+import concurrent.futures
+import json
+import math
+import os
+import random
+import time
+
+from Batch import buildWordSearch
+from WordSearch import FILLS
+
+def directionBalance(puzzle):
+    """How evenly puzzle's words are spread over the 8 directions, from 0
+    (all one way) to 1 (equally many each way): the entropy of the
+    directions, divided by its maximum"""
+
+    counts = collections.Counter(puzzle.locations.record(word)[2]
+                                 for word in puzzle.words)
+    total = len(puzzle.words)
+    if not total:
+        return 0
+    entropy = -sum(count/total*math.log(count/total) for count in counts.values())
+    return entropy/math.log(8)
+
+
+def scorePuzzle(puzzle):
+    """Returns (words placed, overlaps, direction balance), compared in that
+    order. overlaps is the number of letters of hidden words that are
+    shared with an earlier word."""
+
+    letters = sum(map(len, puzzle.words))
+    cells = len(puzzle.solution.cells) - puzzle.solution.cells.count(0)
+    return len(puzzle.words), letters - cells, directionBalance(puzzle)
+
+
+def buildCandidate(size, seed, fill, density, wordList):
+    return buildWordSearch(size, seed, fill, wordList, density).toPuzzle()
+
+
+def buildBest(size, candidates=64, budget=None, workers=None, seed=None,
+              fill="uniform", density=1, wordList=None):
+    """Generates up to candidates puzzles of size and returns the best by
+    scorePuzzle, and the quality vs time curve. Generation stops once
+    budget seconds have passed (if not None), keeping only the candidates
+    finished by then, but always waits for at least one. Ties go to the
+    candidate started first.
+
+    Each candidate's seed is drawn from seed, so the best puzzle can be
+    built again from its seed, fill and density, which the Puzzle (and
+    its asDict, as written by --json) records.
+    workers is the number of processes to use, defaulting to the number of
+    CPUs; workers=1 generates in this process.
+
+    The curve has one dict per finished candidate, in the order they
+    finished: seconds since the start, candidates finished and the best
+    score so far."""
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    seeds = random.Random(seed)
+    start = time.perf_counter()
+    deadline = start + budget if budget is not None else None
+
+    best = None
+    bestKey = None
+    curve = []
+
+    def record(index, puzzle):
+        nonlocal best, bestKey
+        key = (scorePuzzle(puzzle), -index)
+        if bestKey is None or key > bestKey:
+            best, bestKey = puzzle, key
+        words, overlaps, balance = bestKey[0]
+        curve.append({"seconds": time.perf_counter() - start,
+                      "candidates": len(curve) + 1, "words": words,
+                      "overlaps": overlaps, "balance": balance})
+
+    def expired():
+        return (deadline is not None and best is not None and
+                time.perf_counter() >= deadline)
+
+    if workers <= 1:
+        for index in range(candidates):
+            if expired():
+                break
+            record(index, buildCandidate(size, seeds.getrandbits(64), fill,
+                                         density, wordList))
+        return best, curve
+
+    #Only 2*workers candidates are queued at a time, so little work is
+    #thrown away when the budget runs out
+    executor = concurrent.futures.ProcessPoolExecutor(workers)
+    try:
+        pending = {} #future -> candidate index
+        submitted = 0
+        while True:
+            while submitted < candidates and len(pending) < 2*workers:
+                future = executor.submit(buildCandidate, size, seeds.getrandbits(64),
+                                         fill, density, wordList)
+                pending[future] = submitted
+                submitted += 1
+            if not pending or expired():
+                break
+
+            timeout = None
+            if deadline is not None and best is not None:
+                timeout = max(0, deadline - time.perf_counter())
+            done = concurrent.futures.wait(
+                pending, timeout, concurrent.futures.FIRST_COMPLETED).done
+            if expired():
+                break
+            for future in done:
+                record(pending.pop(future), future.result())
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return best, curve
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate the best of several candidate word searches")
+    parser.add_argument("--size", type=int, required=True)
+    parser.add_argument("--candidates", type=int, default=64)
+    parser.add_argument("--budget", type=float, default=None,
+                        help="wall-clock seconds to spend")
+    parser.add_argument("--density", type=float, default=1)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--fill", choices=FILLS, default="uniform")
+    parser.add_argument("--words", default=None,
+                        help="word list to use instead of Dictionary.txt")
+    parser.add_argument("--json", help="write the best puzzle and the curve to this file")
+    args = parser.parse_args()
+
+    best, curve = buildBest(args.size, args.candidates, args.budget, args.workers,
+                            args.seed, args.fill, args.density, args.words)
+
+    print("{:>10} {:>10} {:>6} {:>8} {:>8}".format(
+        "seconds", "candidates", "words", "overlaps", "balance"))
+    #The best score only changes now and then, so print just those points
+    #and the last one. The JSON report has every point.
+    scores = [(point["words"], point["overlaps"], point["balance"]) for point in curve]
+    for i, point in enumerate(curve):
+        if 0 < i < len(curve) - 1 and scores[i] == scores[i - 1]:
+            continue
+        print("{seconds:10.3f} {candidates:10} {words:6} {overlaps:8} "
+              "{balance:8.3f}".format(**point))
+    print("best: seed {} ({} of {} candidates)".format(
+        best.seed, len(curve), args.candidates))
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump({"best": best.asDict(), "score": scorePuzzle(best),
+                       "curve": curve}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,522 @@
+# =============================================================================
+# Word Search Book Renderer
+#
+# Renders puzzles as print-ready pages: a PDF book, or a directory of SVG
+# pages. Each puzzle gets a page with its grid and word bank, and answer
+# keys follow at the end, four to a page, with the hidden words marked.
+# Puzzles are generated on the fly or read from a JSON Lines file written
+# by Export.py.
+#
+# Pages are drawn across a process pool and written as they arrive, so
+# memory stays flat however long the book is. The PDF is written by hand,
+# using the standard Courier and Helvetica fonts, which readers provide
+# and so aren't embedded. Fonts, page templates and the per-size grid
+# layouts are each made once and shared by every page that uses them.
+#
+# Usage: python Book.py --output book.pdf --sizes 15 20 --count 500 [--seed 0]
+#                       [--input puzzles.jsonl] [--format svg] [--page a4]
+#                       [--answers none] [--fill clean] [--words FILE]
+#                       [--workers 4]
+# =============================================================================
+
+import argparse
+import functools
+import gzip
+import json
+import math
+import os
+import sys
+import time
+import zlib
+
+from Batch import buildPuzzle, iterStarmap, puzzleTasks
+from WordSearch import DIRECTIONS, FILLS
+from WordSource import getMappedWordList
+
+#Page width and height in points
+PAGE_SIZES = {"letter": (612, 792), "a4": (595.28, 841.89)}
+MARGIN = 54
+
+#Courier's advance is 0.6 em for every letter. Helvetica's capitals are at
+#most 0.94 em (W), and 0.75 em is enough for whole words in practice.
+COURIER_ADVANCE = 0.6
+HELVETICA_CAPITAL = 0.75
+
+#Fonts as used by the painters: PDF resource name, SVG family and weight
+FONTS = {"Courier-Bold": ("F1", "Courier", "bold"),
+         "Helvetica": ("F2", "Helvetica", "normal"),
+         "Helvetica-Bold": ("F3", "Helvetica", "bold")}
+
+ANSWERS_PER_PAGE = 4
+
+@functools.lru_cache(maxsize=None)
+def pageLayout(page):
+    """Returns the fixed positions on a page of size page as a dict. The
+    grid is a square centred under the title, the word bank fills the space
+    below it, and answer pages hold a 2 x 2 array of smaller grids."""
+
+    width, height = PAGE_SIZES[page]
+    contentWidth = width - 2*MARGIN
+    titleBaseline = height - MARGIN - 20
+    ruleY = height - MARGIN - 30
+    gridTop = ruleY - 16
+    gridSide = min(contentWidth, 0.6*(height - 2*MARGIN))
+    bankHeadingBaseline = gridTop - gridSide - 24
+
+    gap = 24
+    labelHeight = 16
+    answerSide = min((contentWidth - gap)/2,
+                     (gridTop - MARGIN - 2*labelHeight - gap)/2)
+    answerBoxes = []
+    for row in range(2):
+        for column in range(2):
+            left = (width - 2*answerSide - gap)/2 + column*(answerSide + gap)
+            top = gridTop - labelHeight - row*(answerSide + labelHeight + gap)
+            answerBoxes.append((left, top, answerSide))
+
+    return {"width": width, "height": height, "titleBaseline": titleBaseline,
+            "ruleY": ruleY, "gridLeft": (width - gridSide)/2, "gridTop": gridTop,
+            "gridSide": gridSide, "bankHeadingBaseline": bankHeadingBaseline,
+            "bankTop": bankHeadingBaseline - 18, "bankBottom": MARGIN,
+            "answerBoxes": answerBoxes}
+
+
+@functools.lru_cache(maxsize=None)
+def letterLayout(side, size):
+    """Returns (cell, fontSize) for a size x size grid drawn side points
+    wide"""
+
+    cell = side/size
+    return cell, 0.62*cell
+
+
+def bankLayout(page, words):
+    """Returns (fontSize, rows, columnWidth) for the word bank: the largest
+    font, up to 11 points, at which the words fit in columns below the grid"""
+
+    layout = pageLayout(page)
+    height = layout["bankTop"] - layout["bankBottom"]
+    width = layout["width"] - 2*MARGIN
+    longest = max(map(len, words), default=1)
+    fontSize = 11
+    while True:
+        rows = max(1, int(height // (1.25*fontSize)))
+        columns = max(1, math.ceil(len(words)/rows))
+        columnWidth = width/columns
+        if longest*HELVETICA_CAPITAL*fontSize <= columnWidth - 6 or fontSize <= 3:
+            return fontSize, rows, columnWidth
+        fontSize -= 0.5
+
+
+class PdfPainter:
+    """Draws into a PDF content stream. Coordinates are in points from the
+    bottom left of the page."""
+
+    def __init__(self):
+        self.parts = []
+
+    def text(self, x, y, font, fontSize, string):
+        string = string.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+        self.parts.append("BT /{} {:.2f} Tf {:.2f} {:.2f} Td ({}) Tj ET\n".format(
+            FONTS[font][0], fontSize, x, y, string))
+
+    def letterRows(self, left, top, cell, fontSize, rows):
+        """Draws rows of letters in Courier-Bold, each letter centred in its
+        cell of the grid whose top left corner is left, top. Character
+        spacing makes every advance a cell wide, so a row is one string."""
+
+        x = left + cell/2 - COURIER_ADVANCE*fontSize/2
+        y = top - cell/2 - 0.3*fontSize
+        self.parts.append("BT /F1 {:.2f} Tf {:.3f} Tc {:.2f} {:.2f} Td\n".format(
+            fontSize, cell - COURIER_ADVANCE*fontSize, x, y))
+        step = "0 {:.3f} Td\n".format(-cell)
+        self.parts.append(step.join("({}) Tj\n".format(row) for row in rows))
+        self.parts.append("ET\n")
+
+    def line(self, x1, y1, x2, y2, width, gray=0, round=False):
+        self.parts.append("{:.3f} G {:.2f} w {} J {:.2f} {:.2f} m {:.2f} {:.2f} l S\n".format(
+            gray, width, 1 if round else 0, x1, y1, x2, y2))
+
+    def rectangle(self, x, y, width, height, lineWidth):
+        self.parts.append("0 G {:.2f} w {:.2f} {:.2f} {:.2f} {:.2f} re S\n".format(
+            lineWidth, x, y, width, height))
+
+    def result(self):
+        #Graphics state is saved and restored, so results can be joined
+        return ("q\n" + "".join(self.parts) + "Q\n").encode("latin-1")
+
+
+class SvgPainter:
+    """Draws into SVG elements, with the same coordinates as PdfPainter,
+    flipped for SVG's top left origin"""
+
+    def __init__(self, page):
+        self.height = PAGE_SIZES[page][1]
+        self.parts = []
+
+    def text(self, x, y, font, fontSize, string):
+        resource, family, weight = FONTS[font]
+        string = string.replace("&", "&amp;").replace("<", "&lt;")
+        self.parts.append(
+            '<text x="{:.2f}" y="{:.2f}" font-family="{}" font-weight="{}" '
+            'font-size="{:.2f}">{}</text>\n'.format(
+                x, self.height - y, family, weight, fontSize, string))
+
+    def letterRows(self, left, top, cell, fontSize, rows):
+        """Draws rows of letters, each letter centred in its cell. Every
+        letter is its own text element, since SVG Tiny renderers (such as
+        Qt's) don't support a list of x positions."""
+
+        xs = ["{:.2f}".format(left + cell*(i + 0.5)) for i in range(len(rows))]
+        self.parts.append('<g font-family="Courier" font-weight="bold" '
+                          'font-size="{:.2f}" text-anchor="middle">\n'.format(fontSize))
+        for i, row in enumerate(rows):
+            y = '" y="{:.2f}">'.format(self.height - (top - cell*(i + 0.5) - 0.3*fontSize))
+            self.parts.append("".join('<text x="' + x + y + letter + '</text>'
+                                      for x, letter in zip(xs, row)))
+            self.parts.append("\n")
+        self.parts.append("</g>\n")
+
+    def line(self, x1, y1, x2, y2, width, gray=0, round=False):
+        shade = int(255*gray)
+        self.parts.append(
+            '<line x1="{:.2f}" y1="{:.2f}" x2="{:.2f}" y2="{:.2f}" '
+            'stroke="rgb({},{},{})" stroke-width="{:.2f}"{}/>\n'.format(
+                x1, self.height - y1, x2, self.height - y2, shade, shade, shade,
+                width, ' stroke-linecap="round"' if round else ""))
+
+    def rectangle(self, x, y, width, height, lineWidth):
+        self.parts.append(
+            '<rect x="{:.2f}" y="{:.2f}" width="{:.2f}" height="{:.2f}" '
+            'fill="none" stroke="black" stroke-width="{:.2f}"/>\n'.format(
+                x, self.height - y - height, width, height, lineWidth))
+
+    def result(self):
+        return "".join(self.parts)
+
+
+def drawTemplate(painter, page, name):
+    """Draws what every page of a kind has in common: the title rule, and
+    the grid frame and word bank heading ('puzzle') or the title and the
+    four answer frames ('answers')"""
+
+    layout = pageLayout(page)
+    painter.line(MARGIN, layout["ruleY"], layout["width"] - MARGIN, layout["ruleY"], 1)
+    if name == "answers":
+        painter.text(MARGIN, layout["titleBaseline"], "Helvetica-Bold", 20, "Answers")
+        for left, top, side in layout["answerBoxes"]:
+            painter.rectangle(left, top - side, side, side, 1)
+    else:
+        side = layout["gridSide"]
+        painter.rectangle(layout["gridLeft"], layout["gridTop"] - side, side, side, 1.5)
+        painter.text(MARGIN, layout["bankHeadingBaseline"], "Helvetica-Bold", 12,
+                     "Find these words:")
+
+
+@functools.lru_cache(maxsize=None)
+def pdfTemplate(page, name):
+    painter = PdfPainter()
+    drawTemplate(painter, page, name)
+    return painter.result()
+
+
+@functools.lru_cache(maxsize=None)
+def svgTemplate(page, name):
+    painter = SvgPainter(page)
+    drawTemplate(painter, page, name)
+    return painter.result()
+
+
+def drawPuzzlePage(painter, page, number, puzzle):
+    """Draws the page for puzzle (a Puzzle.asDict dict) as puzzle number"""
+
+    layout = pageLayout(page)
+    painter.text(MARGIN, layout["titleBaseline"], "Helvetica-Bold", 20,
+                 "Puzzle {}".format(number))
+
+    cell, fontSize = letterLayout(layout["gridSide"], puzzle["size"])
+    painter.letterRows(layout["gridLeft"], layout["gridTop"], cell, fontSize,
+                       puzzle["grid"])
+
+    words = sorted(word["word"] for word in puzzle["words"])
+    fontSize, rows, columnWidth = bankLayout(page, words)
+    for i, word in enumerate(words):
+        column, row = divmod(i, rows)
+        painter.text(MARGIN + column*columnWidth,
+                     layout["bankTop"] - 1.25*fontSize*row - fontSize,
+                     "Helvetica", fontSize, word)
+
+
+def drawAnswer(painter, page, number, puzzle, slot):
+    """Draws the answer key of puzzle number in slot (0 to 3) of an answer
+    page: its grid with a bar under each hidden word"""
+
+    layout = pageLayout(page)
+    left, top, side = layout["answerBoxes"][slot]
+    painter.text(left, top + 5, "Helvetica-Bold", 10, "Puzzle {}".format(number))
+
+    cell, fontSize = letterLayout(side, puzzle["size"])
+    for word in puzzle["words"]:
+        rowStep, columnStep = DIRECTIONS[word["direction"]]
+        reach = len(word["word"]) - 1
+        x1 = left + (word["column"] + 0.5)*cell
+        y1 = top - (word["row"] + 0.5)*cell
+        painter.line(x1, y1, x1 + columnStep*reach*cell, y1 - rowStep*reach*cell,
+                     0.8*cell, 0.8, round=True)
+    painter.letterRows(left, top, cell, fontSize, puzzle["grid"])
+
+
+def loadPuzzle(source):
+    """A Puzzle.asDict dict from a line of JSON or a puzzleTasks task"""
+
+    if isinstance(source, str):
+        return json.loads(source)
+    return buildPuzzle(*source).asDict()
+
+
+def renderPuzzle(number, source, page, format, answers):
+    """Renders the page of puzzle number, loaded from source, and its
+    answer key block. For PDF both are compressed content streams, for SVG
+    the page is a whole document and the answer block a fragment. The block
+    is None without answers."""
+
+    puzzle = loadPuzzle(source)
+    slot = (number - 1) % ANSWERS_PER_PAGE
+    if format == "pdf":
+        painter = PdfPainter()
+        drawPuzzlePage(painter, page, number, puzzle)
+        pageContent = zlib.compress(painter.result())
+        answer = None
+        if answers:
+            painter = PdfPainter()
+            drawAnswer(painter, page, number, puzzle, slot)
+            answer = zlib.compress(painter.result())
+        return pageContent, answer
+
+    painter = SvgPainter(page)
+    drawPuzzlePage(painter, page, number, puzzle)
+    pageContent = svgDocument(page, svgTemplate(page, "puzzle") + painter.result())
+    answer = None
+    if answers:
+        painter = SvgPainter(page)
+        drawAnswer(painter, page, number, puzzle, slot)
+        answer = painter.result()
+    return pageContent, answer
+
+
+def svgDocument(page, body):
+    width, height = PAGE_SIZES[page]
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<svg xmlns="http://www.w3.org/2000/svg" width="{0}pt" height="{1}pt" '
+            'viewBox="0 0 {0} {1}">\n<rect width="100%" height="100%" fill="white"/>\n'
+            '{2}</svg>\n').format(width, height, body)
+
+
+class PdfBook:
+    """Writes a PDF to file (opened in binary mode) one object at a time.
+    Only the offset of each object and the page object numbers are kept,
+    and the page tree, the shared resources and the cross-reference table
+    are written by finish."""
+
+    def __init__(self, file, page):
+        self.file = file
+        self.page = page
+        self.position = 0
+        self.puzzlePages = []
+        self.answerPages = []
+        self.templates = {} #template name -> (XObject, "/Name Do" stream)
+        self.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+        #The page tree (2) and the resources shared by every page (3) are
+        #written by finish, once all the pages and templates are known
+        self.catalog, self.pages, self.resources = 1, 2, 3
+        self.offsets = [None]*3 #offset of object i + 1
+        self.addObject(b"<< /Type /Catalog /Pages 2 0 R >>", self.catalog)
+        self.fonts = {}
+        for font, (resource, family, weight) in FONTS.items():
+            self.fonts[resource] = self.addObject(
+                "<< /Type /Font /Subtype /Type1 /BaseFont /{} "
+                "/Encoding /WinAnsiEncoding >>".format(font).encode())
+
+    def write(self, data):
+        self.file.write(data)
+        self.position += len(data)
+
+    def addObject(self, body, number=None):
+        """Writes an object and returns its number. Reserved numbers are
+        filled in by passing number."""
+
+        if number is None:
+            self.offsets.append(None)
+            number = len(self.offsets)
+        self.offsets[number - 1] = self.position
+        self.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+        return number
+
+    def addStream(self, data, dictionary=b"", compressed=True):
+        """Writes a stream object and returns its number"""
+
+        if compressed:
+            dictionary += b" /Filter /FlateDecode"
+        return self.addObject(b"<< /Length %d%s >>\nstream\n" % (len(data), dictionary) +
+                              data + b"\nendstream")
+
+    def template(self, name):
+        """Returns the content stream that draws template name, writing it as a
+        form XObject on first use"""
+
+        if name not in self.templates:
+            width, height = PAGE_SIZES[self.page]
+            form = self.addStream(
+                zlib.compress(pdfTemplate(self.page, name)),
+                b" /Type /XObject /Subtype /Form /BBox [0 0 %.2f %.2f] "
+                b"/Resources 3 0 R" % (width, height))
+            self.templates[name] = (form, self.addStream(
+                zlib.compress(b"/T%d Do\n" % form)))
+        return self.templates[name][1]
+
+    def addPage(self, contents):
+        width, height = PAGE_SIZES[self.page]
+        return self.addObject(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.2f %.2f] "
+            b"/Resources 3 0 R /Contents [%s] >>" % (
+                width, height, b" ".join(b"%d 0 R" % stream for stream in contents)))
+
+    def addPuzzlePage(self, content):
+        stream = self.addStream(content)
+        self.puzzlePages.append(self.addPage([self.template("puzzle"), stream]))
+
+    def addAnswerPage(self, blocks):
+        streams = [self.addStream(block) for block in blocks]
+        self.answerPages.append(self.addPage([self.template("answers")] + streams))
+
+    def finish(self):
+        kids = self.puzzlePages + self.answerPages
+        self.addObject(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+            b" ".join(b"%d 0 R" % kid for kid in kids), len(kids)), self.pages)
+        fonts = b" ".join(b"/%s %d 0 R" % (resource.encode(), number)
+                          for resource, number in self.fonts.items())
+        forms = b" ".join(b"/T%d %d 0 R" % (form, form)
+                          for form, stream in self.templates.values())
+        self.addObject(b"<< /Font << %s >> /XObject << %s >> >>" % (fonts, forms),
+                       self.resources)
+
+        xref = self.position
+        self.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(self.offsets) + 1))
+        self.write(b"".join(b"%010d 00000 n \n" % offset for offset in self.offsets))
+        self.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+            len(self.offsets) + 1, xref))
+        return len(kids)
+
+
+class SvgBook:
+    """Writes each page as an SVG file in directory"""
+
+    def __init__(self, directory, page):
+        self.directory = directory
+        self.page = page
+        self.puzzlePages = 0
+        self.answerPages = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def writePage(self, name, document):
+        with open(os.path.join(self.directory, name), "w", encoding="utf-8") as file:
+            file.write(document)
+
+    def addPuzzlePage(self, document):
+        self.puzzlePages += 1
+        self.writePage("puzzle-{:04}.svg".format(self.puzzlePages), document)
+
+    def addAnswerPage(self, blocks):
+        self.answerPages += 1
+        body = svgTemplate(self.page, "answers") + "".join(blocks)
+        self.writePage("answers-{:04}.svg".format(self.answerPages),
+                       svgDocument(self.page, body))
+
+    def finish(self):
+        return self.puzzlePages + self.answerPages
+
+
+def renderBook(book, sources, page="letter", format="pdf", answers=True,
+               workers=None, chunksize=16):
+    """Renders a page for each source (a line of JSON or a puzzleTasks
+    task) into book, a PdfBook or SvgBook, followed by the answer pages,
+    and returns the number of puzzles. Answer pages are written as soon as
+    they're full; in a PDF they're moved after the puzzles by the page
+    tree."""
+
+    tasks = ((number, source, page, format, answers)
+             for number, source in enumerate(sources, 1))
+    blocks = []
+    puzzles = 0
+    for pageContent, answer in iterStarmap(renderPuzzle, tasks, workers, chunksize):
+        puzzles += 1
+        book.addPuzzlePage(pageContent)
+        if answer is not None:
+            blocks.append(answer)
+            if len(blocks) == ANSWERS_PER_PAGE:
+                book.addAnswerPage(blocks)
+                blocks = []
+    if blocks:
+        book.addAnswerPage(blocks)
+    return puzzles
+
+
+def readLines(path):
+    """Yields the non-empty lines of a JSON Lines file, gzipped or not"""
+
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                yield line
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Render word searches as a PDF book or SVG pages")
+    parser.add_argument("--output", required=True,
+                        help="PDF file, or directory for SVG pages")
+    parser.add_argument("--format", choices=("pdf", "svg"), default="pdf")
+    parser.add_argument("--page", choices=sorted(PAGE_SIZES), default="letter")
+    parser.add_argument("--answers", choices=("end", "none"), default="end")
+    parser.add_argument("--input", help="JSON Lines puzzles from Export.py")
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        help="sizes to generate, if there's no --input")
+    parser.add_argument("--count", type=int, default=1, help="puzzles per size")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--fill", choices=FILLS, default="uniform")
+    parser.add_argument("--words", default=None,
+                        help="word list to use instead of Dictionary.txt")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.input:
+        sources = readLines(args.input)
+    elif args.sizes:
+        sources = puzzleTasks(args.sizes, args.count, args.seed, args.fill, args.words)
+        if args.words is not None:
+            getMappedWordList(args.words) #index it once, before the workers start
+    else:
+        parser.error("give --input or --sizes")
+
+    start = time.perf_counter()
+    if args.format == "pdf":
+        with open(args.output, "wb") as file:
+            book = PdfBook(file, args.page)
+            puzzles = renderBook(book, sources, args.page, "pdf",
+                                 args.answers == "end", args.workers)
+            pages = book.finish()
+    else:
+        book = SvgBook(args.output, args.page)
+        puzzles = renderBook(book, sources, args.page, "svg",
+                             args.answers == "end", args.workers)
+        pages = book.finish()
+
+    seconds = time.perf_counter() - start
+    print("rendered {} puzzles on {} pages in {:.2f} s ({:.0f} puzzles/s)".format(
+        puzzles, pages, seconds, puzzles/seconds), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# =============================================================================
+# Word Search Export
+#
+# Command-line bulk generation. Puzzles are streamed as JSON Lines, one
+# Puzzle.asDict object per line, to stdout or a file, optionally gzipped.
+# Puzzles are written and flushed as they're generated, so memory use
+# doesn't grow with --count and a consumer can read them as they arrive.
+#
+# Usage: python Export.py --sizes 15 20 --count 1000 [--seed 0]
+#                         [--fill clean] [--workers 4] [--output FILE]
+#                         [--gzip] [--flush-every 100] [--words FILE]
+# =============================================================================
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+
+from Batch import iterPuzzles
+from WordSearch import FILLS
+
+def writePuzzles(puzzles, file, flushEvery=100):
+    """Writes each Puzzle as a line of JSON to file (opened in binary mode),
+    flushing every flushEvery puzzles. Returns the number written."""
+
+    written = 0
+    for puzzle in puzzles:
+        line = json.dumps(puzzle.asDict(), separators=(",", ":"))
+        file.write(line.encode() + b"\n")
+        written += 1
+        if not written % flushEvery:
+            file.flush()
+    file.flush()
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate word searches as JSON Lines")
+    parser.add_argument("--sizes", type=int, nargs="+", required=True)
+    parser.add_argument("--count", type=int, default=1,
+                        help="puzzles per size")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--fill", choices=FILLS, default="uniform")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default="-",
+                        help="file to write, '-' for stdout")
+    parser.add_argument("--gzip", action="store_true",
+                        help="gzip the output (implied by a .gz --output)")
+    parser.add_argument("--flush-every", type=int, default=100)
+    parser.add_argument("--words", default=None,
+                        help="word list to use instead of Dictionary.txt")
+    args = parser.parse_args()
+
+    if args.output == "-":
+        output = sys.stdout.buffer
+    else:
+        output = open(args.output, "wb")
+    #Each flush of a GzipFile ends a deflate block, so a reader can
+    #decompress everything written so far
+    file = output
+    if args.gzip or args.output.endswith(".gz"):
+        file = gzip.GzipFile(fileobj=output, mode="wb")
+
+    start = time.perf_counter()
+    puzzles = iterPuzzles(args.sizes, args.count, args.workers, args.seed,
+                          args.fill, wordList=args.words)
+    try:
+        written = writePuzzles(puzzles, file, args.flush_every)
+        if file is not output:
+            file.close()
+        output.flush()
+    except BrokenPipeError:
+        #The reader went away, e.g. piped into head. Point stdout at
+        #devnull so that flushing it again on exit doesn't fail too.
+        puzzles.close()
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
+
+    seconds = time.perf_counter() - start
+    print("wrote {} puzzles in {:.2f} s ({:.0f} puzzles/s)".format(
+        written, seconds, written/seconds), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
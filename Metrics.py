@@ -0,0 +1,15 @@
+# =============================================================================
+# Metrics
+#
+# Summary statistics shared by Benchmark and Server. Kept free of the
+# generators so the server can report latency without importing them.
+# =============================================================================
+
+import math
+
+def percentile(values, p):
+    """Nearest-rank percentile of values, p between 0 and 100"""
+
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p/100*len(ordered)))
+    return ordered[rank - 1]
@@ -0,0 +1,113 @@
+# =============================================================================
+# Placement Stats
+#
+# Optional instrumentation for WordSearch. Pass a PlacementStats to
+# WordSearch to record placement attempts, rejections by cause and
+# direction, overlaps and the time spent in each phase of buildArray.
+# Without one, WordSearch only checks that self.stats is None.
+# =============================================================================
+
+import time
+
+class PlacementStats:
+    """Counters for one or more buildArray calls. Counts accumulate across
+    calls until reset() is called.
+
+    attempts/placed: per strategy ('random' or 'overlap')
+    rejections: per cause - 'bounds' if the word would leave the matrix,
+        'conflict' if it would cross a different letter, 'noMatch' if
+        genOverlapPlacement found no placed letter to overlap, and
+        'noPlacement' if an engine found no valid placement at all
+    rejectionsByDirection: per cause, a list indexed by direction 1-8
+    overlapCells: cells shared by a new word and an earlier one
+    overlappingWords: words placed across at least one earlier word
+    phases: seconds spent per buildArray phase ('dictionary', 'fill',
+        'placement', 'output')"""
+
+    def __init__(self):
+        self.reset()
+
+
+    def reset(self):
+        self.puzzles = 0
+        self.attempts = {}
+        self.placed = {}
+        self.rejections = {}
+        self.rejectionsByDirection = {}
+        self.overlapCells = 0
+        self.overlappingWords = 0
+        self.phases = {}
+        self.currentPhase = None
+        self.phaseStart = 0
+
+
+    def phase(self, name):
+        """Ends the current phase, if any, and starts timing phase name.
+        phase(None) only ends the current phase."""
+
+        now = time.perf_counter()
+        if self.currentPhase is not None:
+            self.phases[self.currentPhase] = (self.phases.get(self.currentPhase, 0)
+                                              + now - self.phaseStart)
+        self.currentPhase = name
+        self.phaseStart = now
+
+
+    def recordAttempt(self, strategy):
+        self.attempts[strategy] = self.attempts.get(strategy, 0) + 1
+
+
+    def recordPlacement(self, strategy):
+        self.placed[strategy] = self.placed.get(strategy, 0) + 1
+
+
+    def recordRejection(self, cause, direction=None):
+        self.rejections[cause] = self.rejections.get(cause, 0) + 1
+        if direction is not None:
+            byDirection = self.rejectionsByDirection.setdefault(cause, [0]*9)
+            byDirection[direction] += 1
+
+
+    def recordOverlap(self, sharedCells):
+        """Called by placeWord with the number of cells the new word shares
+        with words already placed"""
+
+        if sharedCells:
+            self.overlapCells += sharedCells
+            self.overlappingWords += 1
+
+
+    def asDict(self):
+        """Returns the counters as plain data, e.g. for json.dump"""
+
+        return {
+            "puzzles": self.puzzles,
+            "attempts": dict(self.attempts),
+            "placed": dict(self.placed),
+            "rejections": dict(self.rejections),
+            "rejectionsByDirection": {cause: counts[1:] for cause, counts
+                                      in self.rejectionsByDirection.items()},
+            "overlapCells": self.overlapCells,
+            "overlappingWords": self.overlappingWords,
+            "phaseSeconds": dict(self.phases),
+        }
+
+
+    def report(self):
+        """Returns a short human-readable summary"""
+
+        lines = ["puzzles: {}".format(self.puzzles)]
+        for strategy in sorted(self.attempts):
+            lines.append("{} placement: {} placed in {} attempts".format(
+                strategy, self.placed.get(strategy, 0), self.attempts[strategy]))
+        for cause in sorted(self.rejections):
+            line = "rejected ({}): {}".format(cause, self.rejections[cause])
+            if cause in self.rejectionsByDirection:
+                line += "  by direction 1-8: {}".format(
+                    self.rejectionsByDirection[cause][1:])
+            lines.append(line)
+        lines.append("overlapping words: {} ({} shared cells)".format(
+            self.overlappingWords, self.overlapCells))
+        for name, seconds in self.phases.items():
+            lines.append("{} phase: {:.2f} ms".format(name, 1000*seconds))
+        return '\n'.join(lines)
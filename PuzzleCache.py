@@ -0,0 +1,166 @@
+# =============================================================================
+# Puzzle Cache
+#
+# Persistent cache of generated puzzles, keyed by size, seed, dictionary
+# version, fill, density and WordSearch.GENERATOR_VERSION, so a puzzle that
+# has been served before is read back instead of being generated again.
+# Each puzzle is one small binary file:
+#
+#   header   "WSP1", size (uint16), number of words (uint16)
+#   grid     size*size ASCII letters, row by row
+#   words    (start row uint16, start column uint16, direction uint8,
+#            length uint8) per word, in wordsAdded order
+#
+# Words, the solution grid and the word locations are all derived from the
+# grid and the word records. Files are read through mmap, and the least
+# recently used files are deleted once the cache exceeds maxBytes.
+# =============================================================================
+
+import collections
+import hashlib
+import mmap
+import os
+import struct
+
+from Batch import buildPuzzle
+from WordIndex import getWordIndex
+from WordSearch import DIRECTIONS, GENERATOR_VERSION, GridView, Puzzle, WordLocations
+
+HEADER = struct.Struct("<4sHH")
+WORD_RECORD = struct.Struct("<HHBB")
+MAGIC = b"WSP1"
+
+def encodePuzzle(puzzle):
+    """Returns the cache file contents for puzzle"""
+
+    parts = [HEADER.pack(MAGIC, puzzle.size, len(puzzle.words))]
+    parts.append(puzzle.grid.cells)
+    for word in puzzle.words:
+        parts.append(WORD_RECORD.pack(*puzzle.locations.record(word)))
+    return b''.join(parts)
+
+
+def decodePuzzle(data, seed=None, dictionaryVersion=None, fill="uniform",
+                 density=1):
+    """Builds a Puzzle from cache file contents (any bytes-like object)"""
+
+    magic, size, wordCount = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("not a puzzle cache file")
+
+    gridStart = HEADER.size
+    letters = bytes(data[gridStart:gridStart + size*size])
+    solution = bytearray(size*size)
+
+    words = []
+    locations = WordLocations(size)
+    offset = gridStart + size*size
+    for record in range(wordCount):
+        row, column, direction, length = WORD_RECORD.unpack_from(data, offset)
+        offset += WORD_RECORD.size
+        rowStep, columnStep = DIRECTIONS[direction]
+        stride = rowStep*size + columnStep
+        start = row*size + column
+        stop = start + stride*length
+        cells = slice(start, stop if stop >= 0 else None, stride)
+        solution[cells] = letters[cells]
+        word = letters[cells].decode("ascii")
+        words.append(word)
+        locations.add(word, row, column, direction)
+
+    return Puzzle(size, GridView(letters, size), GridView(bytes(solution), size),
+                  words, locations, seed, dictionaryVersion, fill, density)
+
+
+class PuzzleCache:
+    """Puzzles stored as files in directory, at most maxBytes in total"""
+
+    def __init__(self, directory, maxBytes=64*1024*1024):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        os.makedirs(directory, exist_ok=True)
+
+        #file name -> size in bytes, least recently used first. Recency
+        #survives restarts through the files' mtimes, updated on each hit.
+        self.files = collections.OrderedDict()
+        entries = [entry for entry in os.scandir(directory)
+                   if entry.name.endswith(".wsp")]
+        for entry in sorted(entries, key=lambda entry: entry.stat().st_mtime_ns):
+            self.files[entry.name] = entry.stat().st_size
+        self.totalBytes = sum(self.files.values())
+
+
+    def fileName(self, size, seed, dictionaryVersion, fill, density):
+        key = repr((size, seed, dictionaryVersion, fill, density,
+                    GENERATOR_VERSION)).encode()
+        return hashlib.sha1(key).hexdigest() + ".wsp"
+
+
+    def get(self, size, seed, dictionaryVersion=None, fill="uniform", density=1):
+        """Returns the cached Puzzle, or None on a miss. dictionaryVersion
+        defaults to the version of the current Dictionary.txt."""
+
+        if dictionaryVersion is None:
+            dictionaryVersion = getWordIndex().version
+        name = self.fileName(size, seed, dictionaryVersion, fill, density)
+        if name not in self.files:
+            return None
+
+        path = os.path.join(self.directory, name)
+        try:
+            with open(path, "rb") as file, \
+                 mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                puzzle = decodePuzzle(data, seed, dictionaryVersion, fill, density)
+            os.utime(path)
+        except FileNotFoundError:
+            #Evicted by another process sharing the directory
+            self.totalBytes -= self.files.pop(name)
+            return None
+
+        self.files.move_to_end(name)
+        return puzzle
+
+
+    def put(self, puzzle):
+        """Stores puzzle, which must have been built from a seed"""
+
+        if puzzle.seed is None:
+            raise ValueError("only seeded puzzles can be cached")
+
+        name = self.fileName(puzzle.size, puzzle.seed, puzzle.dictionaryVersion,
+                             puzzle.fill, puzzle.density)
+        data = encodePuzzle(puzzle)
+        path = os.path.join(self.directory, name)
+
+        #Write to a temporary file first so readers never see half a puzzle
+        temporaryPath = path + ".tmp{}".format(os.getpid())
+        with open(temporaryPath, "wb") as file:
+            file.write(data)
+        os.replace(temporaryPath, path)
+
+        self.totalBytes += len(data) - self.files.pop(name, 0)
+        self.files[name] = len(data)
+        self.evict()
+
+
+    def evict(self):
+        """Deletes least recently used puzzles until within maxBytes"""
+
+        while self.totalBytes > self.maxBytes and self.files:
+            name, fileBytes = self.files.popitem(last=False)
+            self.totalBytes -= fileBytes
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+
+    def getOrBuild(self, size, seed, fill="uniform"):
+        """Returns the puzzle for size, seed and fill from the cache,
+        generating and caching it on a miss"""
+
+        puzzle = self.get(size, seed, fill=fill)
+        if puzzle is None:
+            puzzle = buildPuzzle(size, seed, fill)
+            self.put(puzzle)
+        return puzzle
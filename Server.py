@@ -0,0 +1,336 @@
+# =============================================================================
+# Word Search Server
+#
+# Small HTTP service that serves generated puzzles as JSON. Puzzles are
+# taken from per-size pools of ready puzzles, which worker processes refill
+# in the background, so a request only waits for buildArray when its pool
+# has run dry. Uses only asyncio from the standard library.
+#
+#   GET /puzzle?size=15   grid, word bank and solution of a new puzzle
+#   GET /metrics          request latency, pool levels and counters
+#
+# Usage: python Server.py [--host 127.0.0.1] [--port 8000] [--depth 4]
+#                         [--workers 2] [--preload 15 20] [--fill clean]
+#                         [--max-waiting 16] [--seed 0]
+# =============================================================================
+
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import json
+import random
+import time
+import urllib.parse
+
+from Batch import buildPuzzle
+from Metrics import percentile
+from WordSearch import FILLS
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found",
+               405: "Method Not Allowed", 503: "Service Unavailable",
+               504: "Gateway Timeout"}
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class PuzzleServer:
+    """Serves puzzles of sizes minSize to maxSize. A size gets a pool on its
+    first request (or at start, if it's in preload), which is kept topped up
+    to depth ready puzzles. Generation is the backpressure point: a pool
+    never has more than depth puzzles ready or being generated, plus one for
+    each request waiting on it, and once maxWaiting requests are waiting on
+    an empty pool, further requests for that size get 503 straight away."""
+
+    def __init__(self, depth=4, workers=None, minSize=10, maxSize=55,
+                 preload=(), maxWaiting=16, timeout=30, fill="uniform", seed=None):
+        self.depth = depth
+        self.workers = workers
+        self.minSize = minSize
+        self.maxSize = maxSize
+        self.preload = preload
+        self.maxWaiting = maxWaiting
+        self.timeout = timeout
+        self.fill = fill
+        self.seeds = random.Random(seed)
+
+        self.pools = {} #size -> asyncio.Queue of ready Puzzles
+        self.generating = {} #size -> puzzles being generated
+        self.waiting = {} #size -> requests waiting on an empty pool
+        self.tasks = set() #running generate tasks
+        self.connections = {} #writer -> task serving the connection
+
+        self.counters = collections.Counter()
+        self.latencies = collections.deque(maxlen=1000) #seconds per /puzzle
+        self.generationSeconds = 0
+
+
+    async def start(self, host="127.0.0.1", port=0):
+        """Starts the worker processes and listens on host and port. With
+        port 0 a free port is chosen; the bound port is self.port."""
+
+        self.executor = concurrent.futures.ProcessPoolExecutor(self.workers)
+        for size in self.preload:
+            self.pool(size)
+        self.server = await asyncio.start_server(self.handleConnection, host, port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+
+    async def close(self):
+        """Stops listening, closes open connections and stops the workers"""
+
+        self.server.close()
+        #Closing a connection ends its handler at its next read. Handlers
+        #still waiting for a puzzle are cut off when the workers stop.
+        for writer in list(self.connections):
+            writer.close()
+        if self.connections:
+            await asyncio.wait(list(self.connections.values()), timeout=1)
+        for task in list(self.tasks):
+            task.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        await self.server.wait_closed()
+
+
+    def pool(self, size):
+        """Returns the pool for size, creating it and starting to fill it
+        on first use"""
+
+        if size not in self.pools:
+            self.pools[size] = asyncio.Queue()
+            self.generating[size] = 0
+            self.waiting[size] = 0
+            self.topUp(size)
+        return self.pools[size]
+
+
+    def topUp(self, size):
+        """Starts generating puzzles for size until the ready and generating
+        puzzles cover depth plus the waiting requests"""
+
+        while (self.pools[size].qsize() + self.generating[size]
+               < self.depth + self.waiting[size]):
+            self.generating[size] += 1
+            task = asyncio.get_running_loop().create_task(self.generate(size))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+
+    async def generate(self, size):
+        """Generates one puzzle in a worker process and adds it to the pool"""
+
+        start = time.perf_counter()
+        try:
+            puzzle = await asyncio.get_running_loop().run_in_executor(
+                self.executor, buildPuzzle, size, self.seeds.getrandbits(64),
+                self.fill)
+        except Exception:
+            #Not retried here, or a failing size would keep the workers
+            #busy. The next request for the size tops the pool up again.
+            self.counters["generationErrors"] += 1
+            return
+        finally:
+            self.generating[size] -= 1
+
+        self.generationSeconds += time.perf_counter() - start
+        self.counters["generated"] += 1
+        self.pools[size].put_nowait(puzzle)
+        self.topUp(size)
+
+
+    async def getPuzzle(self, size):
+        """Takes a puzzle from the pool for size, waiting for one to be
+        generated if the pool is empty"""
+
+        if not self.minSize <= size <= self.maxSize:
+            raise HTTPError(400, "size must be between {} and {}".format(
+                self.minSize, self.maxSize))
+
+        pool = self.pool(size)
+        if not pool.empty():
+            puzzle = pool.get_nowait()
+        else:
+            if self.waiting[size] >= self.maxWaiting:
+                self.counters["rejected"] += 1
+                raise HTTPError(503, "too many requests waiting for size {}".format(size))
+            self.counters["waited"] += 1
+            self.waiting[size] += 1
+            self.topUp(size)
+            try:
+                puzzle = await asyncio.wait_for(pool.get(), self.timeout)
+            except asyncio.TimeoutError:
+                raise HTTPError(504, "timed out generating a puzzle")
+            finally:
+                self.waiting[size] -= 1
+
+        self.topUp(size)
+        return puzzle
+
+
+    def metrics(self):
+        """Returns request latency, pool levels and counters as plain data"""
+
+        latencies = list(self.latencies)
+        generated = self.counters["generated"]
+        return {
+            "requests": self.counters["requests"],
+            "served": self.counters["served"],
+            "waited": self.counters["waited"],
+            "rejected": self.counters["rejected"],
+            "errors": self.counters["errors"],
+            "generated": generated,
+            "generationErrors": self.counters["generationErrors"],
+            "meanGenerationMs": 1000*self.generationSeconds/generated if generated else None,
+            "latencyMs": {
+                "samples": len(latencies),
+                "p50": 1000*percentile(latencies, 50) if latencies else None,
+                "p95": 1000*percentile(latencies, 95) if latencies else None,
+                "p99": 1000*percentile(latencies, 99) if latencies else None,
+                "max": 1000*max(latencies) if latencies else None,
+            },
+            "pools": {size: {"ready": self.pools[size].qsize(),
+                             "generating": self.generating[size],
+                             "waiting": self.waiting[size]}
+                      for size in sorted(self.pools)},
+        }
+
+
+    async def respond(self, method, target):
+        """Returns the status and JSON body for a request"""
+
+        url = urllib.parse.urlsplit(target)
+        if url.path not in ("/puzzle", "/metrics"):
+            raise HTTPError(404, "no such path")
+        if method != "GET":
+            raise HTTPError(405, "only GET is supported")
+        if url.path == "/metrics":
+            return 200, self.metrics()
+
+        start = time.perf_counter()
+        query = urllib.parse.parse_qs(url.query)
+        try:
+            size = int(query["size"][0])
+        except (KeyError, ValueError):
+            raise HTTPError(400, "size must be given as an integer")
+
+        puzzle = await self.getPuzzle(size)
+        body = puzzle.asDict()
+        body["solution"] = list(puzzle.solution)
+        self.counters["served"] += 1
+        self.latencies.append(time.perf_counter() - start)
+        return 200, body
+
+
+    async def discardBody(self, reader, headers):
+        """Reads and drops the request body given by headers. Returns False
+        if the body's end can't be found, in which case nothing is read."""
+
+        if "transfer-encoding" in headers:
+            return False
+        try:
+            remaining = int(headers.get("content-length", 0))
+        except ValueError:
+            return False
+        if remaining < 0:
+            return False
+        while remaining:
+            chunk = await reader.read(min(remaining, 65536))
+            if not chunk:
+                return False
+            remaining -= len(chunk)
+        return True
+
+
+    async def handleConnection(self, reader, writer):
+        """Serves HTTP/1.1 requests on one connection, keeping it open
+        between requests unless the client asks to close it"""
+
+        self.connections[writer] = asyncio.current_task()
+        try:
+            while True:
+                requestLine = await reader.readline()
+                if not requestLine:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                self.counters["requests"] += 1
+                #No route takes a body, but one that was sent has to be
+                #read past before the next request on the connection. A
+                #chunked body can't be skipped this way, so the connection
+                #is closed after responding instead.
+                framed = await self.discardBody(reader, headers)
+                try:
+                    method, target, version = requestLine.decode("latin-1").split()
+                except ValueError:
+                    status, body = 400, {"error": "malformed request line"}
+                    version = "HTTP/1.0"
+                else:
+                    try:
+                        status, body = await self.respond(method, target)
+                    except HTTPError as error:
+                        status, body = error.status, {"error": str(error)}
+                if status != 200:
+                    self.counters["errors"] += 1
+
+                keepAlive = (framed and version == "HTTP/1.1" and
+                             headers.get("connection", "").lower() != "close")
+                payload = json.dumps(body, separators=(",", ":")).encode()
+                head = ("HTTP/1.1 {} {}\r\nContent-Type: application/json\r\n"
+                        "Content-Length: {}\r\nConnection: {}\r\n\r\n").format(
+                    status, STATUS_TEXT[status], len(payload),
+                    "keep-alive" if keepAlive else "close")
+                writer.write(head.encode() + payload)
+                await writer.drain()
+                if not keepAlive:
+                    break
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            #Client went away, or sent a line longer than the reader's limit
+            pass
+        finally:
+            del self.connections[writer]
+            writer.close()
+
+
+async def serve(args):
+    server = PuzzleServer(args.depth, args.workers, preload=args.preload,
+                          maxWaiting=args.max_waiting, fill=args.fill,
+                          seed=args.seed)
+    await server.start(args.host, args.port)
+    print("serving on http://{}:{}".format(args.host, server.port))
+    try:
+        await server.server.serve_forever()
+    finally:
+        await server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve word searches over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--depth", type=int, default=4,
+                        help="ready puzzles to keep per size")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--preload", type=int, nargs="*", default=[],
+                        help="sizes to fill pools for at start")
+    parser.add_argument("--max-waiting", type=int, default=16)
+    parser.add_argument("--fill", choices=FILLS, default="uniform")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
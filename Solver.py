@@ -0,0 +1,335 @@
+# =============================================================================
+# Word Search Solver
+#
+# Finds every dictionary word in a letter grid, in all 8 directions, e.g. to
+# check generated puzzles for words that were never hidden or for extra
+# copies of hidden words. The dictionary and its reversed words are compiled
+# into one Aho-Corasick automaton, stored as a dense transition table. Every
+# row, column and diagonal of the grid is joined into one text, so a single
+# pass over it finds words read forwards and backwards in every line.
+#
+# Usage: python Solver.py [--size 55] [--count 1000] [--min-length 3]
+#                         [--workers 4] [--seed 0]
+# =============================================================================
+
+import argparse
+import collections
+import functools
+import multiprocessing
+import os
+import string
+import threading
+import time
+
+from WordIndex import DICTIONARY_PATH, getWordIndex
+from Batch import generateMany
+from WordSearch import DIRECTIONS
+
+#Symbols of the automaton: A-Z are 0-25 and anything else, such as the
+#separator between lines, is 26 and returns the automaton to its root
+SYMBOLS = 27
+SEPARATOR = b'\n'
+SYMBOL_CODES = bytes(string.ascii_uppercase.find(chr(code)) % SYMBOLS
+                     for code in range(256))
+
+#(row step, column step) each kind of line is read in: rows, columns,
+#diagonals and antidiagonals, from the top or left
+LINES = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+def opposite(direction):
+    return (direction + 3) % 8 + 1
+
+
+@functools.lru_cache(maxsize=None)
+def gridLines(size):
+    """Returns the lines of a size x size grid as (slice, direction) pairs:
+    rows (direction 4), columns (6), diagonals (5) and antidiagonals (7),
+    each slicing its cells out of the flat row-major grid in order"""
+
+    lines = []
+    for row in range(size):
+        lines.append((slice(row*size, (row + 1)*size), 4))
+    for column in range(size):
+        lines.append((slice(column, size*size, size), 6))
+    starts = [(row, 0) for row in range(size - 1, 0, -1)]
+    starts += [(0, column) for column in range(size)]
+    for row, column in starts:
+        length = size - max(row, column)
+        start = row*size + column
+        lines.append((slice(start, start + (size + 1)*(length - 1) + 1, size + 1), 5))
+    starts = [(0, column) for column in range(size)]
+    starts += [(row, size - 1) for row in range(1, size)]
+    for row, column in starts:
+        length = min(column + 1, size - row)
+        start = row*size + column
+        lines.append((slice(start, start + (size - 1)*(length - 1) + 1, size - 1), 7))
+    return lines
+
+
+@functools.lru_cache(maxsize=8)
+def gridLayout(size):
+    """Returns the lines of gridLines(size) and, for each position of their
+    joined text, the grid offset, the line's direction and the opposite
+    direction (None at separators)"""
+
+    lines = gridLines(size)
+    offsets = []
+    directions = []
+    for cells, direction in lines:
+        line = range(size*size)[cells]
+        offsets.extend(line)
+        offsets.append(None)
+        directions.extend([direction]*len(line))
+        directions.append(None)
+    reverseDirections = [direction and opposite(direction) for direction in directions]
+    return lines, offsets, directions, reverseDirections
+
+
+class Solver:
+    """Aho-Corasick automaton over words and their reverses. State s is
+    stored premultiplied as s*SYMBOLS, so the next state after symbol c is
+    transitions[s + c]. outputs maps each state where words end, all
+    numbered from firstOutput on, to (word, length, reversed) entries,
+    longest first, reversed being True for a word read backwards.
+    depths[s // SYMBOLS] is the length of the longest suffix of the text
+    read so far that starts a word. Words shorter than minLength are left
+    out."""
+
+    def __init__(self, words, minLength=1):
+        #Trie of the words and the reverse of each word that isn't a
+        #palindrome. Nodes are numbered in insertion order.
+        self.minLength = minLength
+        children = [{}]
+        ends = {}
+        for word in words:
+            if len(word) < minLength:
+                continue
+            patterns = [(word, False)]
+            if word[::-1] != word:
+                patterns.append((word[::-1], True))
+            for pattern, reversed in patterns:
+                node = 0
+                for letter in pattern:
+                    symbol = SYMBOL_CODES[ord(letter)]
+                    child = children[node].get(symbol)
+                    if child is None:
+                        child = children[node][symbol] = len(children)
+                        children.append({})
+                    node = child
+                ends.setdefault(node, []).append((word, len(word), reversed))
+
+        #Fill in the transition table breadth first. Each node starts from
+        #the row of its failure node, the longest proper suffix of it that
+        #is in the trie, so every row is complete.
+        transitions = [0]*(len(children)*SYMBOLS)
+        found = {} #node -> words ending there, including at its suffixes
+        failures = [0]*len(children)
+        depths = [0]*len(children)
+        queue = collections.deque([0])
+        while queue:
+            node = queue.popleft()
+            base = node*SYMBOLS
+            if node:
+                failure = failures[node]
+                transitions[base:base + SYMBOLS] = \
+                    transitions[failure*SYMBOLS:(failure + 1)*SYMBOLS]
+                words = ends.get(node, []) + found.get(failure, [])
+                if words:
+                    found[node] = words
+            for symbol, child in children[node].items():
+                #The row of the failure node is already final, since it is
+                #shallower than node
+                failures[child] = transitions[base + symbol] if node else 0
+                depths[child] = depths[node] + 1
+                transitions[base + symbol] = child
+                queue.append(child)
+
+        #Renumber the states so that those where words end come last, and
+        #checking for a match while scanning is a single comparison
+        order = [node for node in range(len(children)) if node not in found]
+        self.firstOutput = len(order)*SYMBOLS
+        order += list(found)
+        newBases = [0]*len(children)
+        for state, node in enumerate(order):
+            newBases[node] = state*SYMBOLS
+        table = []
+        for node in order:
+            table.extend(transitions[node*SYMBOLS:(node + 1)*SYMBOLS])
+
+        self.transitions = [newBases[node] for node in table]
+        self.outputs = {newBases[node]: words for node, words in found.items()}
+        self.depths = [depths[node] for node in order]
+        self.states = len(children)
+
+
+    def findAll(self, cells, size):
+        """Returns every occurrence of a word at least minLength long in a
+        size x size grid, given as flat row-major ASCII letters (such as
+        WordSearch.letters or Puzzle.grid.cells). Occurrences are
+        (word, row, column, direction) tuples, with row and column the cell
+        of the word's first letter. A palindrome reads the same both ways,
+        so it is reported once, read forwards along its line."""
+
+        lines, offsets, directions, reverseDirections = gridLayout(size)
+        text = SEPARATOR.join([cells[line] for line, direction in lines])
+        text = text.translate(SYMBOL_CODES)
+
+        transitions = self.transitions
+        firstOutput = self.firstOutput
+        state = 0
+        ends = []
+        for position, symbol in enumerate(text):
+            state = transitions[state + symbol]
+            if state >= firstOutput:
+                ends.append((position, state))
+
+        outputs = self.outputs
+        occurrences = []
+        for position, state in ends:
+            for word, length, reversed in outputs[state]:
+                if reversed:
+                    offset = offsets[position]
+                    direction = reverseDirections[position]
+                else:
+                    offset = offsets[position - length + 1]
+                    direction = directions[position]
+                occurrences.append((word, offset//size, offset % size, direction))
+        return occurrences
+
+
+    def completesWord(self, cells, size, row, column, symbol, previousStates):
+        """Returns True if putting symbol in the cell at row, column of a
+        partly filled grid (flat row-major ASCII letters, 0 where empty)
+        completes a word through that cell. previousStates are the states
+        after reading each line of LINES up to the cell. Filled cells after
+        it are read until no word through the cell can still end."""
+
+        transitions = self.transitions
+        for (rowStep, columnStep), state in zip(LINES, previousStates):
+            state = transitions[state + symbol]
+            nextRow, nextColumn = row, column
+            reach = 0 #cells read after the cell
+            while True:
+                #The longest word ending here is the first output
+                if state >= self.firstOutput and self.outputs[state][0][1] > reach:
+                    return True
+                if self.depths[state//SYMBOLS] <= reach:
+                    break
+                nextRow += rowStep
+                nextColumn += columnStep
+                if nextRow >= size or not 0 <= nextColumn < size:
+                    break
+                code = cells[nextRow*size + nextColumn]
+                if not code:
+                    break
+                state = transitions[state + SYMBOL_CODES[code]]
+                reach += 1
+        return False
+
+
+    def checkPuzzle(self, puzzle):
+        """Finds words in puzzle other than its hidden words. Returns a dict
+        with 'duplicates', occurrences of hidden words away from where they
+        were hidden, and 'extras', occurrences of other words. Words lying
+        entirely inside a hidden word are part of it and aren't reported."""
+
+        size = puzzle.size
+        owners = [0]*(size*size) #bit i is set if hidden word i covers the cell
+        for index, word in enumerate(puzzle.words):
+            bit = 1 << index
+            for offset in puzzle.locations.offsets(word):
+                owners[offset] |= bit
+
+        words = set(puzzle.words)
+        result = {"duplicates": [], "extras": []}
+        for occurrence in self.findAll(puzzle.grid.cells, size):
+            word, row, column, direction = occurrence
+            rowStep, columnStep = DIRECTIONS[direction]
+            offset = row*size + column
+            stride = rowStep*size + columnStep
+            #Hidden words covering every cell so far
+            covering = owners[offset]
+            for i in range(1, len(word)):
+                if not covering:
+                    break
+                offset += stride
+                covering &= owners[offset]
+            if covering:
+                continue
+            if word in words:
+                result["duplicates"].append(occurrence)
+            else:
+                result["extras"].append(occurrence)
+        return result
+
+
+_solvers = {}
+_solversLock = threading.Lock()
+
+def getSolver(minLength=3, path=DICTIONARY_PATH):
+    """Returns the process-wide Solver for the words at least minLength long
+    in the word list at path, building it on first use and rebuilding it
+    whenever the word list has changed."""
+
+    with _solversLock:
+        index = getWordIndex(path)
+        solver = _solvers.get((path, minLength))
+        if solver is None or solver.version != index.version:
+            solver = _solvers[path, minLength] = Solver(index.words, minLength)
+            solver.version = index.version
+        return solver
+
+
+def checkPuzzle(puzzle, minLength=3):
+    """Solver.checkPuzzle with the solver for Dictionary.txt"""
+
+    return getSolver(minLength).checkPuzzle(puzzle)
+
+
+def checkMany(puzzles, minLength=3, workers=None):
+    """Runs checkPuzzle on every puzzle, spread over workers processes
+    (defaulting to the number of CPUs), and returns the results in order"""
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(puzzles) <= 1:
+        return [checkPuzzle(puzzle, minLength) for puzzle in puzzles]
+
+    #Each worker builds the automaton once, so hand out puzzles in chunks
+    chunksize = max(1, len(puzzles) // (4*workers))
+    with multiprocessing.Pool(workers) as pool:
+        return pool.starmap(checkPuzzle, [(puzzle, minLength) for puzzle in puzzles],
+                            chunksize)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check generated puzzles for words that weren't hidden")
+    parser.add_argument("--size", type=int, default=55)
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--min-length", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    puzzles = generateMany(args.size, args.count, args.workers, args.seed)
+
+    start = time.perf_counter()
+    solver = getSolver(args.min_length)
+    print("automaton: {} states, built in {:.2f} s".format(
+        solver.states, time.perf_counter() - start))
+
+    start = time.perf_counter()
+    results = checkMany(puzzles, args.min_length, args.workers)
+    seconds = time.perf_counter() - start
+
+    duplicates = sum(len(result["duplicates"]) for result in results)
+    extras = sum(len(result["extras"]) for result in results)
+    print("checked {} puzzles in {:.2f} s ({:.0f} puzzles/s)".format(
+        len(puzzles), seconds, len(puzzles)/seconds))
+    print("per puzzle: {:.2f} duplicated hidden words, {:.1f} extra words".format(
+        duplicates/len(puzzles), extras/len(puzzles)))
+
+
+if __name__ == "__main__":
+    main()
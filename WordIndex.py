@@ -0,0 +1,304 @@
+# =============================================================================
+# Word Index
+#
+# Loads a word list (Dictionary.txt by default) once per process and keeps
+# it bucketed by word length, so puzzles of any size can sample words
+# without rereading or rescanning the file.
+#
+# WordIndex.query selects words by length range, prefix, letters and tags,
+# e.g. index.query(6, 9, alphabet="AEIOULNRST") or index.query(tag="animals"),
+# and returns a WordSelection, which samples like the index itself and so
+# can be passed to WordSearch as its wordSource. Selections are cached, so
+# a themed puzzle costs the same as a random one after the first query.
+# =============================================================================
+
+import array
+import bisect
+import collections
+import hashlib
+import os
+import random
+import string
+import threading
+
+DICTIONARY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               "Dictionary.txt")
+
+LETTER_BITS = {letter: bit for bit, letter in enumerate(string.ascii_uppercase)}
+
+def letterMask(letters):
+    """Bitmask of letters: bit i for the i-th letter of the alphabet, and
+    bit 26 for anything that isn't A-Z"""
+
+    mask = 0
+    for letter in letters:
+        mask |= 1 << LETTER_BITS.get(letter, 26)
+    return mask
+
+
+class WordBuckets:
+    """Words sorted by length, so all words up to a given length are a
+    prefix of self.words. lengthEnds[n] is the number of words with
+    length <= n."""
+
+    def setWords(self, words):
+        self.words = words
+        self.lengthEnds = [0]
+        for length in range(1, len(words[-1]) + 1 if words else 1):
+            end = self.lengthEnds[-1]
+            while end < len(words) and len(words[end]) == length:
+                end += 1
+            self.lengthEnds.append(end)
+
+
+    def count(self, maxLength):
+        """Number of words no longer than maxLength"""
+
+        if maxLength < 0:
+            return 0
+        return self.lengthEnds[min(maxLength, len(self.lengthEnds) - 1)]
+
+
+    def randomWord(self, maxLength, rng=random):
+        """Returns a random word no longer than maxLength in O(1)"""
+
+        return self.words[rng.randrange(self.count(maxLength))]
+
+
+    def sample(self, maxLength, k, rng=random):
+        """Returns up to k distinct random words no longer than maxLength"""
+
+        end = self.count(maxLength)
+        return [self.words[i] for i in rng.sample(range(end), min(k, end))]
+
+
+class WordSelection(WordBuckets):
+    """Words of a WordIndex matching a query, in the index's order. Its
+    version identifies both the word list and the query."""
+
+    def __init__(self, words, version):
+        self.setWords(words)
+        self.version = version
+
+
+class WordIndex(WordBuckets):
+    """Holds the words of a word list uppercased and sorted by length, and
+    alphabetically within each length"""
+
+    def __init__(self, path=DICTIONARY_PATH):
+        self.path = path
+        self.load()
+
+
+    def load(self):
+        """Reads the word list and rebuilds the length buckets"""
+
+        stat = os.stat(self.path)
+        with open(self.path, "rb") as file:
+            data = file.read()
+
+        self.mtime = stat.st_mtime_ns
+        self.fileSize = stat.st_size
+        self.version = hashlib.sha1(data).hexdigest()
+
+        #dict.fromkeys drops duplicate lines. Words are alphabetical within
+        #each length, which query relies on to find prefixes.
+        words = list(dict.fromkeys(data.decode().upper().split()))
+        words.sort(key=lambda word: (len(word), word))
+        self.setWords(words)
+
+        #Built on the first query or tag that needs them
+        self.masks = None #letterMask of each word
+        self.letterGroups = None #per length, letterMask -> word positions
+        self.positions = None #word -> position in words
+        self.tags = {} #tag -> (sorted array of word positions, version)
+        self.selections = collections.OrderedDict() #query -> WordSelection
+
+
+    def isStale(self):
+        """Returns True if the file on disk no longer matches the loaded
+        words. The file is only rehashed when its mtime or size changed."""
+
+        stat = os.stat(self.path)
+        if stat.st_mtime_ns == self.mtime and stat.st_size == self.fileSize:
+            return False
+
+        with open(self.path, "rb") as file:
+            version = hashlib.sha1(file.read()).hexdigest()
+        if version != self.version:
+            return True
+
+        #File was touched but its contents are unchanged
+        self.mtime = stat.st_mtime_ns
+        self.fileSize = stat.st_size
+        return False
+
+
+    def addTag(self, tag, words):
+        """Tags words (any iterable of words) as tag, for query(tag=...).
+        Words that aren't in the index are ignored. Tagging again replaces
+        the tag's words."""
+
+        if self.positions is None:
+            self.positions = {word: position for position, word in enumerate(self.words)}
+        positions = sorted({self.positions[word] for word in map(str.upper, words)
+                            if word in self.positions})
+        version = hashlib.sha1("\n".join(self.words[i] for i in positions).encode())
+        self.tags[tag] = (array.array("L", positions), version.hexdigest())
+        #Cached selections may have used the old words
+        self.selections.clear()
+
+
+    def query(self, minLength=1, maxLength=None, prefix=None, alphabet=None,
+              sharesLetters=None, tag=None):
+        """Returns a WordSelection of the words that are minLength to
+        maxLength long, start with prefix, use only letters in alphabet,
+        have a letter in common with sharesLetters (e.g. the words already
+        placed) and are tagged tag. Criteria left as None aren't applied.
+
+        Length and prefix are looked up in the sorted words, and a tag
+        reads only its own words. Letter constraints are looked up in the
+        words grouped by their set of letters (see lookUpLetters), or
+        checked on each tagged word. The last 64 selections are cached."""
+
+        key = (minLength, maxLength, prefix and prefix.upper(),
+               alphabet and "".join(sorted(set(alphabet.upper()))),
+               sharesLetters and "".join(sorted(set(sharesLetters.upper()))), tag)
+        selection = self.selections.get(key)
+        if selection is not None:
+            self.selections.move_to_end(key)
+            return selection
+
+        prefix = key[2]
+        if maxLength is None:
+            maxLength = len(self.lengthEnds) - 1
+        if prefix:
+            minLength = max(minLength, len(prefix))
+
+        #Runs of positions that pass the length and prefix criteria
+        runs = []
+        if prefix:
+            #Words of each length are alphabetical, so the words starting
+            #with prefix are one run of each length bucket
+            for length in range(minLength, maxLength + 1):
+                start, end = self.count(length - 1), self.count(length)
+                first = bisect.bisect_left(self.words, prefix, start, end)
+                last = bisect.bisect_left(self.words, prefix + "\U0010ffff", first, end)
+                runs.append((first, last))
+        else:
+            runs.append((self.count(minLength - 1), self.count(maxLength)))
+
+        tagVersion = None
+        allowed = letterMask(key[3]) if alphabet else None
+        shared = letterMask(key[4]) if sharesLetters else None
+        if tag is not None:
+            tagged, tagVersion = self.tags[tag]
+            positions = [position for first, last in runs for position in
+                         tagged[bisect.bisect_left(tagged, first):
+                                bisect.bisect_left(tagged, last)]]
+            if alphabet or sharesLetters:
+                positions = self.filterByLetters(positions, allowed, shared)
+        elif alphabet or sharesLetters:
+            positions = self.lookUpLetters(runs, minLength, maxLength,
+                                           allowed, shared)
+        else:
+            positions = [position for first, last in runs
+                         for position in range(first, last)]
+
+        version = hashlib.sha1(repr((self.version, key, tagVersion)).encode())
+        selection = WordSelection([self.words[i] for i in positions],
+                                  version.hexdigest())
+        self.selections[key] = selection
+        if len(self.selections) > 64:
+            self.selections.popitem(last=False)
+        return selection
+
+
+    def filterByLetters(self, positions, allowed, shared):
+        """Keeps the positions whose words use only letters in allowed and
+        have one in shared (letterMasks, None to skip the check)"""
+
+        if self.masks is None:
+            self.masks = array.array("L", map(letterMask, self.words))
+        masks = self.masks
+        if allowed is not None:
+            positions = [i for i in positions if not masks[i] & ~allowed]
+        if shared is not None:
+            positions = [i for i in positions if masks[i] & shared]
+        return positions
+
+
+    def lookUpLetters(self, runs, minLength, maxLength, allowed, shared):
+        """Positions within runs whose words use only letters in allowed
+        and have one in shared, in order. Reads the words grouped by their
+        set of letters, so the cost is the number of letter sets checked
+        (at most 2**len(allowed) of each length) plus the words returned,
+        not the number of words in runs. Runs shorter than that are checked
+        word by word."""
+
+        if self.letterGroups is None:
+            self.letterGroups = [{} for length in self.lengthEnds]
+            for position, word in enumerate(self.words):
+                groups = self.letterGroups[len(word)]
+                mask = letterMask(word)
+                if mask not in groups:
+                    groups[mask] = array.array("L")
+                groups[mask].append(position)
+
+        positions = []
+        for length in range(minLength, min(maxLength, len(self.lengthEnds) - 1) + 1):
+            groups = self.letterGroups[length]
+            start, end = self.count(length - 1), self.count(length)
+            #The part of each run in this length bucket
+            bounds = [(max(first, start), min(last, end)) for first, last in runs
+                      if first < end and last > start]
+            if not groups or not bounds:
+                continue
+
+            subsets = 1 << bin(allowed).count("1") if allowed is not None else len(groups)
+            if sum(last - first for first, last in bounds) < min(subsets, len(groups)):
+                #A short run (e.g. a prefix) is cheaper to check word by word
+                positions.extend(self.filterByLetters(
+                    [i for first, last in bounds for i in range(first, last)],
+                    allowed, shared))
+                continue
+
+            if subsets < len(groups):
+                #Few enough letters to look up every subset of them
+                masks, subset = [], allowed
+                while True:
+                    if subset in groups:
+                        masks.append(subset)
+                    if not subset:
+                        break
+                    subset = (subset - 1) & allowed
+            else:
+                masks = [mask for mask in groups
+                         if allowed is None or not mask & ~allowed]
+            if shared is not None:
+                masks = [mask for mask in masks if mask & shared]
+
+            for mask in masks:
+                group = groups[mask]
+                for first, last in bounds:
+                    if first == start and last == end:
+                        positions.extend(group)
+                    else:
+                        positions.extend(group[bisect.bisect_left(group, first):
+                                               bisect.bisect_left(group, last)])
+        positions.sort()
+        return positions
+
+
+_indexes = {}
+_indexesLock = threading.Lock()
+
+def getWordIndex(path=DICTIONARY_PATH):
+    """Returns the process-wide WordIndex for path, loading it on first use
+    and reloading it whenever the file has changed on disk."""
+
+    with _indexesLock:
+        index = _indexes.get(path)
+        if index is None or index.isStale():
+            index = _indexes[path] = WordIndex(path)
+        return index
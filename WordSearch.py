@@ -3,40 +3,370 @@
 # Created by Josh Humphries May 2020
 # =============================================================================
 
+import array
+import collections.abc
+import functools
 import math
 import random
 import string
+import time
+
+from WordIndex import getWordIndex
+
+#(row step, column step) for each placement direction. Direction 1 runs
+#up and to the left, and the rest follow clockwise.
+DIRECTIONS = {1: (-1, -1), 2: (-1, 0), 3: (-1, 1), 4: (0, 1),
+              5: (1, 1), 6: (1, 0), 7: (1, -1), 8: (0, -1)}
+
+#(row step, column step) -> direction
+STEP_DIRECTIONS = {step: direction for direction, step in DIRECTIONS.items()}
+
+@functools.lru_cache(maxsize=4096)
+def startRegions(size, length):
+    """Returns where a word of length can start in a size x size grid
+    without leaving it, for each direction: a tuple indexed by direction
+    (index 0 is unused) of (firstRow, lastRow, firstColumn, lastColumn),
+    inclusive, or None if the word doesn't fit in that direction. Cached,
+    so puzzles of the same size share the table."""
+    
+    reach = length - 1
+    regions = [None]
+    for direction in range(1, 9):
+        rowStep, columnStep = DIRECTIONS[direction]
+        firstRow, lastRow = max(0, -rowStep*reach), size - 1 - max(0, rowStep*reach)
+        firstColumn = max(0, -columnStep*reach)
+        lastColumn = size - 1 - max(0, columnStep*reach)
+        if firstRow <= lastRow and firstColumn <= lastColumn:
+            regions.append((firstRow, lastRow, firstColumn, lastColumn))
+        else:
+            regions.append(None)
+    return tuple(regions)
+
+
+#Fill strategies for buildArray. 'uniform' draws every letter at random
+#before placement. 'clean' fills the cells left empty after placement,
+#avoiding letters that complete a dictionary word.
+FILLS = ("uniform", "clean")
+
+#Changes whenever the same seed, dictionary, fill and density would give a
+#different puzzle, so puzzles stored under the old version aren't reused
+GENERATOR_VERSION = 2
+
+class GridView:
+    """Read-only view of a flat row-major grid of ASCII codes as a list of
+    rows, so grid[row][column] and iterating over rows work as they did when
+    grids were nested lists. Rows are strings, made on access, and empty
+    (zero) cells read as empty."""
+    
+    def __init__(self, cells, size, empty='.'):
+        self.cells = cells
+        self.size = size
+        self.table = bytes.maketrans(b'\0', empty.encode())
+        
+    def __len__(self):
+        return self.size
+    
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(self.size))]
+        if row < 0:
+            row += self.size
+        if not 0 <= row < self.size:
+            raise IndexError("grid row out of range")
+        start = row*self.size
+        return self.cells[start:start + self.size].translate(self.table).decode('ascii')
+    
+    def __iter__(self):
+        for row in range(self.size):
+            yield self[row]
+            
+    def tolist(self):
+        """Returns the grid as nested lists of letters"""
+        
+        return [list(row) for row in self]
+
+
+class WordLocations(collections.abc.Mapping):
+    """Where the hidden words of a size x size grid are: a Mapping of each
+    word, in the order added, to its list of (row, column) coordinates.
+    Each word is kept as a (row, column, direction, length) record in one
+    flat array, and its coordinates are derived when asked for. wordsAt
+    looks up the words through a cell in a reverse index of cell offsets to
+    word ids (positions in words), built on first use."""
+    
+    def __init__(self, size):
+        self.size = size
+        self.words = [] #word id -> word
+        self.ids = {} #word -> word id
+        self.records = array.array('H') #4 per word id
+        self.cellIds = None #cell offset -> ids of the words through it
+        
+    def __len__(self):
+        return len(self.words)
+    
+    def __iter__(self):
+        return iter(self.words)
+    
+    def __contains__(self, word):
+        return word in self.ids
+    
+    def __getitem__(self, word):
+        row, column, direction, length = self.record(word)
+        rowStep, columnStep = DIRECTIONS[direction]
+        return [(row + rowStep*i, column + columnStep*i) for i in range(length)]
+    
+    def __getstate__(self):
+        #The reverse index is rebuilt when needed rather than pickled
+        state = self.__dict__.copy()
+        state['cellIds'] = None
+        return state
+    
+    def record(self, word):
+        """Returns (row, column, direction, length) of word's first letter"""
+        
+        start = 4*self.ids[word]
+        return tuple(self.records[start:start + 4])
+    
+    def offsets(self, word):
+        """Returns the flat offsets of word's cells, in order, as a range"""
+        
+        row, column, direction, length = self.record(word)
+        rowStep, columnStep = DIRECTIONS[direction]
+        stride = rowStep*self.size + columnStep
+        start = row*self.size + column
+        return range(start, start + stride*length, stride)
+    
+    def add(self, word, row, column, direction):
+        """Records word as placed from row, column in direction"""
+        
+        wordId = len(self.words)
+        self.ids[word] = wordId
+        self.words.append(word)
+        self.records.extend((row, column, direction, len(word)))
+        if self.cellIds is not None:
+            for offset in self.offsets(word):
+                self.cellIds.setdefault(offset, []).append(wordId)
+        
+    def pop(self, word):
+        """Removes word and returns its coordinates. Removing the last word
+        added keeps the reverse index; any other word drops it, since the
+        ids of later words change."""
+        
+        coordPairs = self[word]
+        wordId = self.ids[word]
+        if self.cellIds is not None:
+            if wordId == len(self.words) - 1:
+                for offset in self.offsets(word):
+                    ids = self.cellIds[offset]
+                    ids.pop()
+                    if not ids:
+                        del self.cellIds[offset]
+            else:
+                self.cellIds = None
+        
+        del self.ids[word]
+        del self.words[wordId]
+        del self.records[4*wordId:4*wordId + 4]
+        for later in self.words[wordId:]:
+            self.ids[later] -= 1
+        return coordPairs
+    
+    def wordsAt(self, row, column):
+        """Returns the words through the cell at row, column, in the order
+        added"""
+        
+        if self.cellIds is None:
+            self.cellIds = {}
+            for wordId, word in enumerate(self.words):
+                for offset in self.offsets(word):
+                    self.cellIds.setdefault(offset, []).append(wordId)
+        return [self.words[wordId] for wordId in
+                self.cellIds.get(row*self.size + column, ())]
+
+
+class Puzzle:
+    """A finished word search, free of generation state so it can be passed
+    between processes. grid is the letter matrix, solution has only the
+    hidden words ('.' elsewhere), both as GridViews, words are the hidden
+    words and locations is their WordLocations."""
+    
+    def __init__(self, size, grid, solution, words, locations, seed=None,
+                 dictionaryVersion=None, fill="uniform", density=1):
+        self.size = size
+        self.grid = grid
+        self.solution = solution
+        self.words = words
+        self.locations = locations
+        
+        #With the size, these identify the puzzle: building it again from
+        #the same seed and dictionary with the same fill and density gives
+        #the same grid. seed is None if the puzzle was not built from a seed.
+        self.seed = seed
+        self.dictionaryVersion = dictionaryVersion
+        self.fill = fill
+        self.density = density
+        
+        
+    def asDict(self):
+        """Returns the puzzle as plain data, e.g. for json.dumps. The grid is
+        a list of row strings, and each word has the row and column of its
+        first letter and its direction (see DIRECTIONS). The solution and
+        word locations follow from those, so they're left out."""
+        
+        words = []
+        for word in self.words:
+            row, column, direction, length = self.locations.record(word)
+            words.append({"word": word, "row": row, "column": column,
+                          "direction": direction})
+        return {
+            "size": self.size,
+            "seed": self.seed,
+            "dictionaryVersion": self.dictionaryVersion,
+            "fill": self.fill,
+            "density": self.density,
+            "grid": list(self.grid),
+            "words": words,
+        }
+
 
 class WordSearch:
-    """Holds word search matrix in letterArray, as well as methods that 
-    generate the matrix."""
+    """Holds word search matrix, as well as methods that generate the matrix.
+    All random choices are drawn from self.rng. stats is an optional
+    PlacementStats that records how words were placed. wordSource is where
+    hidden words are sampled from: anything with a version and a
+    sample(maxLength, k, rng) method, such as a WordIndex or one of the
+    word lists in WordSource. None uses the index of Dictionary.txt.
     
-    def buildArray(self, size):
-        """Generates word matrix based on size. size comes from user input"""
+    The matrix is stored as flat row-major bytearrays of ASCII codes, with
+    the cell at (row, column) at offset row*size + column: letters has every
+    letter, hidden only the letters of placed words and 0 elsewhere.
+    letterArray and hiddenArray are GridViews of them."""
+    
+    def __init__(self, seed=None, stats=None, wordSource=None):
+        self.setSeed(seed)
+        self.stats = stats
+        self.wordSource = wordSource
+        
         
-        self.letterArray = [[random.choice(string.ascii_uppercase) for x in range(size)] for y in range(size)]
+    def setSeed(self, seed):
+        """seed is either a random.Random instance, which is used as is, or a
+        seed for a new one (int, str or bytes). A WordSearch with a seed value
+        reseeds before each buildArray, so the same size and dictionary
+        always give the same puzzle. None seeds from the OS once."""
+        
+        if isinstance(seed, random.Random):
+            self.rng = seed
+            self.seed = None
+        else:
+            self.rng = random.Random(seed)
+            self.seed = seed
+        
+        
+    def buildArray(self, size, verbose=True, density=1, fill="uniform"):
+        """Generates word matrix based on size. size comes from user input.
+        density scales the number of hidden words and fill is one of FILLS.
+        Prints the result unless verbose is False."""
+        
+        if fill not in FILLS:
+            raise ValueError("unknown fill: {!r}".format(fill))
+        if self.seed is not None:
+            self.rng.seed(self.seed)
+        
+        stats = self.stats
+        if stats is not None:
+            stats.puzzles += 1
+            stats.phase("fill")
+        
+        if fill == "uniform":
+            choice = self.rng.choice
+            uppercase = string.ascii_uppercase.encode()
+            self.letters = bytearray([choice(uppercase) for i in range(size*size)])
+        else:
+            self.letters = bytearray(size*size) #filled by fillClean
+        self.hidden = bytearray(size*size)
         self.size = size
+        self.fill = fill
+        self.density = density
         
         #Number of hidden words is a function of size
-        numWordsToFind = math.floor(((1/4)*size)**(12/7))
+        numWordsToFind = math.floor(density*((1/4)*size)**(12/7))
+        self.numWordsToFind = numWordsToFind
         
-        dictionary = []
-        self.wordsToFind = []
-        self.hiddenArray = [['.' for x in range(size)] for y in range(size)]
         self.wordsAdded = []
-        self.wordLocations = {}
+        self.wordLocations = WordLocations(size)
+        self.foundWords = set() #words passed to markFound
+        self.letterCoords = {} #letter -> list of coords where it's placed
+        self.indexedCoords = set() #coords already in letterCoords
         
-        with open("Dictionary.txt") as file:
-            for line in file:
-                if len(line) <= size:
-                    dictionary.append(line.strip().upper())
+        if stats is not None:
+            stats.phase("dictionary")
         
-        for i in range (numWordsToFind):
-            self.wordsToFind.append(random.choice(dictionary))
+        #Words can be as long as the matrix is wide. Sampled words are
+        #distinct, since wordLocations can only hold one location per word.
+        wordSource = self.wordSource
+        if wordSource is None:
+            wordSource = getWordIndex()
+        self.dictionaryVersion = wordSource.version
+        self.wordsToFind = wordSource.sample(size, numWordsToFind, self.rng)
         
         #Better to place large words first
         self.wordsToFind.sort(key=len, reverse=True)
         
+        if stats is not None:
+            stats.phase("placement")
+        
+        self.placeWords()
+        
+        if fill == "clean":
+            if stats is not None:
+                stats.phase("fill")
+            self.fillClean()
+        
+        if verbose:
+            if stats is not None:
+                stats.phase("output")
+            self.printArrays()
+        
+        if stats is not None:
+            stats.phase(None)
+        
+        
+    @property
+    def letterArray(self):
+        return GridView(self.letters, self.size)
+    
+    
+    @property
+    def hiddenArray(self):
+        return GridView(self.hidden, self.size)
+        
+        
+    def cellSlice(self, word, direction, row, column):
+        """Returns the slice of letters and hidden covering word placed at
+        row, column in direction, or None if it would leave the matrix.
+        Each step in a direction is a fixed stride through the flat grid."""
+        
+        size = self.size
+        rowStep, columnStep = DIRECTIONS[direction]
+        endRow = row + rowStep*(len(word) - 1)
+        endColumn = column + columnStep*(len(word) - 1)
+        if not (0 <= row < size and 0 <= column < size and
+                0 <= endRow < size and 0 <= endColumn < size):
+            return None
+        
+        stride = rowStep*size + columnStep
+        stop = endRow*size + endColumn + stride
+        #A negative stop would count from the end of the grid
+        return slice(row*size + column, stop if stop >= 0 else None, stride)
+        
+        
+    def placeWords(self, deadline=None):
+        """Places the words in wordsToFind, removing each word once it is
+        placed. Words that can't be placed are left in wordsToFind. Stops
+        early once time.perf_counter() passes deadline, if given."""
+        
+        numWordsToFind = self.numWordsToFind
+        
         #Loop to randomly place words. Loop attempts to place words that
         #overlap already-placed words. Loop continues until either all words 
         #are placed or count has reached 4*numWordsToFind. This is to prevent 
@@ -44,12 +374,14 @@ class WordSearch:
         count = 0
         while self.wordsToFind and count < 4*numWordsToFind:
             for word in self.wordsToFind[:]:
+                if deadline is not None and time.perf_counter() > deadline:
+                    return
                 if not self.wordsAdded:
                     if self.genRandomPlacement(word):
                         self.wordsToFind.remove(word)
                         continue
                 else:
-                    if random.randint(1,10) < 4:
+                    if self.rng.randint(1,10) < 4:
                         if self.genOverlapPlacement(word):
                             self.wordsToFind.remove(word)
                             continue
@@ -60,6 +392,74 @@ class WordSearch:
             count += 1
             continue
         
+        
+    def fillClean(self):
+        """Fills the cells left empty by placement, in row-major order. Each
+        letter is drawn at random from those that don't complete a word of
+        3 or more letters from Dictionary.txt, forwards or backwards, in any
+        line through the cell. forcedCells counts cells where every letter
+        completes a word and a uniformly random one is used.
+        
+        Words made only of hidden letters are not the fill's doing, so the
+        puzzle can still have those."""
+        
+        #Imported here since Solver imports WordSearch
+        from Solver import getSolver, SYMBOL_CODES
+        solver = getSolver()
+        transitions = solver.transitions
+        
+        size = self.size
+        letters = self.letters
+        uppercase = string.ascii_uppercase.encode()
+        self.forcedCells = 0
+        
+        #Automaton states after reading each line of Solver.LINES (rows,
+        #columns, diagonals and antidiagonals) up to and including a cell,
+        #by offset. In row-major order every earlier cell of each line is
+        #filled when a cell is reached.
+        rowStates = [0]*(size*size)
+        columnStates = [0]*(size*size)
+        diagonalStates = [0]*(size*size)
+        antidiagonalStates = [0]*(size*size)
+        
+        for row in range(size):
+            for column in range(size):
+                offset = row*size + column
+                previousStates = (
+                    rowStates[offset - 1] if column else 0,
+                    columnStates[offset - size] if row else 0,
+                    diagonalStates[offset - size - 1] if row and column else 0,
+                    antidiagonalStates[offset - size + 1]
+                        if row and column < size - 1 else 0)
+                
+                code = letters[offset]
+                if not code:
+                    #Draw letters without replacement until one fits
+                    candidates = list(uppercase)
+                    while candidates:
+                        index = self.rng.randrange(len(candidates))
+                        code = candidates[index]
+                        if not solver.completesWord(letters, size, row, column,
+                                                    SYMBOL_CODES[code], previousStates):
+                            break
+                        candidates[index] = candidates[-1]
+                        candidates.pop()
+                    else:
+                        code = self.rng.choice(uppercase)
+                        self.forcedCells += 1
+                    letters[offset] = code
+                
+                symbol = SYMBOL_CODES[code]
+                rowStates[offset] = transitions[previousStates[0] + symbol]
+                columnStates[offset] = transitions[previousStates[1] + symbol]
+                diagonalStates[offset] = transitions[previousStates[2] + symbol]
+                antidiagonalStates[offset] = transitions[previousStates[3] + symbol]
+    
+    
+    def printArrays(self):
+        """Prints the letter matrix, the hidden words alone, the words that
+        could not be placed and the words that were placed"""
+        
         print('\n'.join([''.join(['{:2}'.format(item) for item in row]) 
       for row in self.letterArray]))
         print('\n')
@@ -67,6 +467,39 @@ class WordSearch:
       for row in self.hiddenArray]))
         print(self.wordsToFind)
         print(self.wordsAdded)
+        
+        
+    def wordAt(self, coordPairs):
+        """Returns the placed word covering exactly the cells in coordPairs,
+        in any order, or None if there isn't one. A word and its reverse can
+        cover the same cells, in which case the first placed is returned."""
+        
+        coordPairs = set(coordPairs)
+        if not coordPairs:
+            return None
+        row, column = next(iter(coordPairs))
+        for word in self.wordLocations.wordsAt(row, column):
+            if (word not in self.foundWords and len(word) == len(coordPairs) and
+                coordPairs.issuperset(self.wordLocations[word])):
+                return word
+        return None
+    
+    
+    def markFound(self, word):
+        """Removes a found word from wordsAdded, so wordAt no longer
+        returns it"""
+        
+        self.wordsAdded.remove(word)
+        self.foundWords.add(word)
+        
+        
+    def toPuzzle(self):
+        """Returns the generated word search as a Puzzle"""
+        
+        return Puzzle(self.size, GridView(bytes(self.letters), self.size),
+                      GridView(bytes(self.hidden), self.size),
+                      self.wordsAdded, self.wordLocations, self.seed,
+                      self.dictionaryVersion, self.fill, self.density)
 
             
     def genRandomPlacement(self, word):
@@ -74,53 +507,33 @@ class WordSearch:
         50 attempts to place the word - if it cannot, returns False."""
         
         count = 0
+        regions = startRegions(self.size, len(word))
+        if regions[1] is None:
+            return False #Longer than the matrix is wide, so fits nowhere
         
         while count < 50:
+            if self.stats is not None:
+                self.stats.recordAttempt("random")
             
             #direction the word is placed is randomly chosen first
-            direction = random.randint(1,8)
+            direction = self.rng.randint(1,8)
             
             #based on direction, only the possible locations where the first
             #letter of the word can be placed and the word will not extend 
             #outside of the matrix are chosen from
-            if direction == 1:
-                #choose random start row
-                row = random.randint(len(word) - 1, len(self.letterArray) - 1)
-                #choose random start column
-                column = random.randint(len(word) - 1, len(self.letterArray) - 1)
-                    
-            elif direction == 2:
-                row = random.randint(len(word) - 1, len(self.letterArray) - 1)
-                column = random.randint(0, len(self.letterArray) - 1)
-                    
-            elif direction == 3:
-                row = random.randint(len(word) - 1, len(self.letterArray) - 1)
-                column = random.randint(0, len(self.letterArray) - len(word) - 1)
-                    
-            elif direction == 4:
-                row = random.randint(0, len(self.letterArray) - 1)
-                column = random.randint(0, len(self.letterArray) - len(word) - 1)
-                    
-            elif direction == 5:
-                row = random.randint(0, len(self.letterArray) - len(word) - 1)
-                column = random.randint(0, len(self.letterArray) - len(word) - 1)
-                    
-            elif direction == 6:
-                row = random.randint(0, len(self.letterArray) - len(word) - 1)
-                column = random.randint(0, len(self.letterArray) - 1)
-                    
-            elif direction == 7:
-                row = random.randint(0, len(self.letterArray) - len(word) - 1)
-                column = random.randint(len(word) - 1, len(self.letterArray) - 1)
-                    
-            elif direction == 8:
-                row = random.randint(0, len(self.letterArray) - 1)
-                column = random.randint(len(word) - 1, len(self.letterArray) - 1)
+            firstRow, lastRow, firstColumn, lastColumn = regions[direction]
+            row = self.rng.randint(firstRow, lastRow)
+            column = self.rng.randint(firstColumn, lastColumn)
                 
             if self.checkValidPlacement(word, direction, row, column):
                 self.placeWord(word, direction, row, column)
+                if self.stats is not None:
+                    self.stats.recordPlacement("random")
                 return True
             else:
+                if self.stats is not None:
+                    self.stats.recordRejection(
+                        self.rejectionCause(word, direction, row, column), direction)
                 count += 1
                 continue
             
@@ -140,66 +553,41 @@ class WordSearch:
         count = 0
         
         while count < 30:
+            if self.stats is not None:
+                self.stats.recordAttempt("overlap")
+            
             #Chooses letter from word to be placed to try to overlap
-            overlapLetterIndex = random.randint(0, len(word) - 1)
+            overlapLetterIndex = self.rng.randint(0, len(word) - 1)
             overlapLetter = word[overlapLetterIndex]
-            matchingCoords = []
             
-            #Creats a list of tuples of all coordinates with letter that
-            #matches the randomly chosen letter
-            for i, row in enumerate(self.hiddenArray):
-                for j, column in enumerate(self.hiddenArray):
-                    if self.hiddenArray[i][j] == overlapLetter:
-                        matchingCoords.append((i,j))
-        
+            #All coordinates of placed letters that match the randomly
+            #chosen letter, kept up to date by placeWord
+            matchingCoords = self.letterCoords.get(overlapLetter)
             
             if not matchingCoords:
+                if self.stats is not None:
+                    self.stats.recordRejection("noMatch")
                 count += 1
-                continue;
-            elif len(matchingCoords) == 1:
-                row, column = matchingCoords[0]
-            else:
-                row, column = random.choice(matchingCoords)
-            
-            direction = random.randint(1,8)
-            
-            if direction == 1:
-                startingRow = row + overlapLetterIndex
-                startingColumn = column + overlapLetterIndex
-                
-            elif direction == 2:
-                startingRow = row + overlapLetterIndex
-                startingColumn = column
+                continue
+            row, column = self.rng.choice(matchingCoords)
             
-            elif direction == 3:
-                startingRow = row + overlapLetterIndex
-                startingColumn = column - overlapLetterIndex
+            direction = self.rng.randint(1,8)
             
-            elif direction == 4:
-                startingRow = row
-                startingColumn = column - overlapLetterIndex
-                
-            elif direction == 5:
-                startingRow = row - overlapLetterIndex
-                startingColumn = column - overlapLetterIndex
-                
-            elif direction == 6:
-                startingRow = row - overlapLetterIndex
-                startingColumn = column
-                
-            elif direction == 7:
-                startingRow = row - overlapLetterIndex
-                startingColumn = column + overlapLetterIndex
-                
-            elif direction == 8:
-                startingRow = row
-                startingColumn = column + overlapLetterIndex
+            #Start so that letter overlapLetterIndex lands on row, column
+            rowStep, columnStep = DIRECTIONS[direction]
+            startingRow = row - rowStep*overlapLetterIndex
+            startingColumn = column - columnStep*overlapLetterIndex
                 
             if self.checkValidPlacement(word, direction, startingRow, startingColumn):
                 self.placeWord(word, direction, startingRow, startingColumn)
+                if self.stats is not None:
+                    self.stats.recordPlacement("overlap")
                 return True
             
             else:
+                if self.stats is not None:
+                    self.stats.recordRejection(self.rejectionCause(
+                        word, direction, startingRow, startingColumn), direction)
                 count += 1
                 continue
             
@@ -210,141 +598,47 @@ class WordSearch:
         """Checks if generated placement of word is valid. Returns False
         if invalid."""
         
-        if (row < 0 or column < 0 or column >= self.size or row >= self.size):
+        cells = self.cellSlice(word, direction, row, column)
+        if cells is None:
             return False
         
-        elif direction == 1:
-            for i, letter in enumerate(word):
-                if row - i < 0 or column - i < 0:
-                    return False
-                if (self.hiddenArray[row - i][column - i] != '.' and 
-                    self.hiddenArray[row - i][column - i] != letter):
-                    return False
-                    
-        elif direction == 2:
-            for i, letter in enumerate(word):
-                if row - i < 0:
-                    return False
-                if (self. hiddenArray[row - i][column] != '.' and 
-                    self.hiddenArray[row - i][column] != letter):
-                    return False
-                
-                
-        elif direction == 3:
-            for i, letter in enumerate(word):
-                if row - i < 0 or column + i >= self.size:
-                    return False
-                if (self.hiddenArray[row - i][column + i] != '.' and 
-                    self.hiddenArray[row - i][column + i] != letter):
-                    return False
-                
-        elif direction == 4:
-            for i, letter in enumerate(word):
-                if column + i >= self.size:
-                    return False
-                if (self.hiddenArray[row][column + i] != '.' and 
-                    self.hiddenArray[row][column + i] != letter):
-                    return False
-
-        elif direction == 5:
-            for i, letter in enumerate(word):
-                if row + i >= self.size or column + i >= self.size:
-                    return False
-                if (self.hiddenArray[row + i][column + i] != '.' 
-                    and self.hiddenArray[row + i][column + i] != letter):
-                    return False
-                
-        elif direction == 6:
-            for i, letter in enumerate(word):
-                if row + i >= self.size:
-                    return False
-                if (self.hiddenArray[row + i][column] != '.' 
-                    and self.hiddenArray[row + i][column] != letter):
-                    return False
-                
-        elif direction == 7:
-            for i, letter in enumerate(word):
-                if row + i >= self.size or column - i < 0:
-                    return False
-                if (self.hiddenArray[row + i][column - i] != '.' 
-                    and self.hiddenArray[row + i][column - i] != letter):
-                    return False
-                
-        elif direction == 8:
-            for i, letter in enumerate(word):
-                if column - i < 0:
-                    return False
-                if (self.hiddenArray[row][column - i] != '.' and 
-                    self.hiddenArray[row][column - i] != letter):
-                    return False
-                
+        #Each cell must be empty or already hold the same letter
+        for placed, code in zip(self.hidden[cells], word.encode()):
+            if placed and placed != code:
+                return False
         return True
 
 
+    def rejectionCause(self, word, direction, row, column):
+        """Returns why checkValidPlacement rejected a placement: 'bounds' if
+        the word would leave the matrix, otherwise 'conflict'"""
+        
+        if self.cellSlice(word, direction, row, column) is None:
+            return "bounds"
+        return "conflict"
+
+
     def placeWord(self, word, direction, row, column):
         """Places word in word matrix after valid location generated"""
-        coordPairs = []
-        
-        if direction == 1:
-            self.wordsAdded.append(word)
-            for i, letter in enumerate(word):
-                self.letterArray[row - i][column - i] = letter
-                self.hiddenArray[row - i][column - i] = letter
-                coordPairs.append((row - i, column - i))
-            self.wordLocations[word] = coordPairs
-                
-        if direction == 2:
-            self.wordsAdded.append(word)
-            for i, letter in enumerate(word):
-                self.letterArray[row - i][column] = letter
-                self.hiddenArray[row - i][column] = letter
-                coordPairs.append((row - i, column))
-            self.wordLocations[word] = coordPairs
-                
-        if direction == 3:
-            self.wordsAdded.append(word)
-            for i, letter in enumerate(word):
-                self.letterArray[row - i][column + i] = letter
-                self.hiddenArray[row - i][column + i] = letter
-                coordPairs.append((row - i, column + i))
-            self.wordLocations[word] = coordPairs
-                
-        if direction == 4:
-            self.wordsAdded.append(word)
-            for i, letter in enumerate(word):
-                self.letterArray[row][column + i] = letter
-                self.hiddenArray[row][column + i] = letter
-                coordPairs.append((row, column + i))
-            self.wordLocations[word] = coordPairs
-                
-        if direction == 5:
-            self.wordsAdded.append(word)
-            for i, letter in enumerate(word):
-                self.letterArray[row + i][column + i] = letter
-                self.hiddenArray[row + i][column + i] = letter
-                coordPairs.append((row + i, column + i))
-            self.wordLocations[word] = coordPairs
-                
-        if direction == 6:
-            self.wordsAdded.append(word)
-            for i, letter in enumerate(word):
-                self.letterArray[row + i][column] = letter
-                self.hiddenArray[row + i][column] = letter
-                coordPairs.append((row + i, column))
-            self.wordLocations[word] = coordPairs
-                
-        if direction == 7:
-            self.wordsAdded.append(word)
-            for i, letter in enumerate(word):
-                self.letterArray[row + i][column - i] = letter
-                self.hiddenArray[row + i][column - i] = letter
-                coordPairs.append((row + i, column - i))
-            self.wordLocations[word] = coordPairs
-                
-        if direction == 8:
-            self.wordsAdded.append(word)
-            for i, letter in enumerate(word):
-                self.letterArray[row][column - i] = letter
-                self.hiddenArray[row][column - i] = letter
-                coordPairs.append((row, column - i))
-            self.wordLocations[word] = coordPairs
+        
+        codes = word.encode()
+        cells = self.cellSlice(word, direction, row, column)
+        self.letters[cells] = codes
+        self.hidden[cells] = codes
+        
+        self.wordsAdded.append(word)
+        self.wordLocations.add(word, row, column, direction)
+        coordPairs = self.wordLocations[word]
+        
+        #Index newly filled cells by letter for genOverlapPlacement. Cells
+        #shared with an earlier word are already indexed.
+        sharedCells = 0
+        for coordPair, letter in zip(coordPairs, word):
+            if coordPair not in self.indexedCoords:
+                self.indexedCoords.add(coordPair)
+                self.letterCoords.setdefault(letter, []).append(coordPair)
+            else:
+                sharedCells += 1
+        
+        if self.stats is not None:
+            self.stats.recordOverlap(sharedCells)
@@ -0,0 +1,247 @@
+# =============================================================================
+# Word Sources
+#
+# Word lists too big to load into memory, for WordSearch(wordSource=...).
+# Anything with a version identifying the list's contents and a
+# sample(maxLength, k, rng) returning up to k distinct uppercase words no
+# longer than maxLength can be a word source; WordIndex is the in-memory one.
+#
+# ReservoirWordList reads through the file on every sample, keeping only k
+# words. MappedWordList builds an index of word offsets by length once,
+# stored next to the list (or in the user's cache directory if the list's
+# directory is read-only), and samples by seeking into the memory-mapped
+# list. Only words made of the letters A-Z are used, since puzzle grids
+# are ASCII. Versions are the sha1 of the file, as for WordIndex.
+# =============================================================================
+
+import array
+import hashlib
+import mmap
+import os
+import random
+import struct
+import threading
+
+def hashFile(path):
+    """sha1 of the file at path, read in chunks"""
+
+    digest = hashlib.sha1()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ReservoirWordList:
+    """Word list sampled by reservoir sampling over the whole file, so
+    memory use only depends on k"""
+
+    def __init__(self, path):
+        self.path = path
+        self.version = hashFile(path)
+
+
+    def words(self, maxLength):
+        """Yields the usable words no longer than maxLength, uppercased, as
+        bytes"""
+
+        with open(self.path, "rb") as file:
+            for line in file:
+                word = line.strip()
+                if len(word) <= maxLength and word.isalpha():
+                    yield word.upper()
+
+
+    def sample(self, maxLength, k, rng=random):
+        """Returns up to k distinct random words no longer than maxLength.
+        Repeated lines are sampled like any others and then dropped, so a
+        list with repeats can give fewer than k words."""
+
+        reservoir = []
+        for seen, word in enumerate(self.words(maxLength)):
+            if seen < k:
+                reservoir.append(word)
+            else:
+                replace = rng.randrange(seen + 1)
+                if replace < k:
+                    reservoir[replace] = word
+        return list(dict.fromkeys(word.decode() for word in reservoir))
+
+
+#Index file: header, then lengthEnds as uint64s (lengthEnds[n] is the number
+#of words with length <= n), then the offset of each word's line as uint64s,
+#sorted by word length
+INDEX_HEADER = struct.Struct("<4sQQ40sH")
+INDEX_MAGIC = b"WSX1"
+UINT64 = struct.Struct("<Q")
+
+def cacheIndexPath(path):
+    """Where the index of the list at path goes when it can't be written
+    next to the list: the user's cache directory, named by the list's
+    absolute path"""
+
+    directory = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache")
+    name = hashlib.sha1(os.path.abspath(path).encode()).hexdigest() + ".idx"
+    return os.path.join(directory, "word-search", name)
+
+
+class MappedWordList:
+    """Word list sampled through an index of line offsets, at
+    indexPath. By default that's path + '.idx', or cacheIndexPath(path)
+    if the list's directory can't be written to. The index is rebuilt
+    whenever it's unreadable or the list's size or mtime no longer match
+    it. Sampling reads k words, so memory and time don't depend on the
+    size of the list."""
+
+    def __init__(self, path, indexPath=None):
+        self.path = path
+        if indexPath is not None:
+            self.indexPaths = [indexPath]
+        else:
+            self.indexPaths = [path + ".idx", cacheIndexPath(path)]
+
+        for self.indexPath in self.indexPaths:
+            if self.load():
+                return
+        self.buildIndex()
+        if not self.load():
+            raise ValueError("could not index {}".format(path))
+
+
+    def load(self):
+        """Maps the list and its index. Returns False if the index is
+        missing, out of date or damaged."""
+
+        stat = os.stat(self.path)
+        try:
+            with open(self.indexPath, "rb") as file:
+                index = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return False
+
+        #A truncated or overwritten index is treated like a stale one
+        try:
+            magic, fileSize, mtime, version, maxLength = INDEX_HEADER.unpack_from(index, 0)
+            lengthEnds = [UINT64.unpack_from(index, INDEX_HEADER.size + 8*length)[0]
+                          for length in range(maxLength + 1)]
+        except struct.error:
+            index.close()
+            return False
+        offsetsStart = INDEX_HEADER.size + 8*(maxLength + 1)
+        if (magic != INDEX_MAGIC or fileSize != stat.st_size or
+            mtime != stat.st_mtime_ns or len(index) != offsetsStart + 8*lengthEnds[-1]):
+            index.close()
+            return False
+
+        self.index = index
+        self.fileSize = fileSize
+        self.mtime = mtime
+        self.version = version.decode()
+        self.lengthEnds = lengthEnds
+        self.offsetsStart = offsetsStart
+
+        if fileSize:
+            with open(self.path, "rb") as file:
+                self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.data = b""
+        return True
+
+
+    def buildIndex(self):
+        """Reads the list once, recording the offset of each usable word's
+        line by word length, and writes the index to the first of
+        indexPaths that can be written to, setting indexPath"""
+
+        stat = os.stat(self.path)
+        digest = hashlib.sha1()
+        buckets = {} #length -> array of line offsets
+        offset = 0
+        with open(self.path, "rb") as file:
+            for line in file:
+                digest.update(line)
+                word = line.strip()
+                if word.isalpha():
+                    buckets.setdefault(len(word), array.array("Q")).append(offset)
+                offset += len(line)
+
+        maxLength = max(buckets, default=0)
+        lengthEnds = array.array("Q", [0])
+        for length in range(1, maxLength + 1):
+            lengthEnds.append(lengthEnds[-1] + len(buckets.get(length, ())))
+
+        for self.indexPath in self.indexPaths:
+            #Write to a temporary file first so readers never see half an index
+            temporaryPath = self.indexPath + ".tmp{}".format(os.getpid())
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.indexPath)),
+                            exist_ok=True)
+                with open(temporaryPath, "wb") as file:
+                    file.write(INDEX_HEADER.pack(INDEX_MAGIC, stat.st_size,
+                                                 stat.st_mtime_ns,
+                                                 digest.hexdigest().encode(), maxLength))
+                    file.write(lengthEnds.tobytes())
+                    for length in range(1, maxLength + 1):
+                        if length in buckets:
+                            file.write(buckets[length].tobytes())
+                os.replace(temporaryPath, self.indexPath)
+                return
+            except OSError as error:
+                lastError = error
+                try:
+                    os.remove(temporaryPath)
+                except OSError:
+                    pass
+        raise lastError
+
+
+    def isStale(self):
+        stat = os.stat(self.path)
+        return stat.st_size != self.fileSize or stat.st_mtime_ns != self.mtime
+
+
+    def count(self, maxLength):
+        """Number of words no longer than maxLength"""
+
+        if maxLength < 0:
+            return 0
+        return self.lengthEnds[min(maxLength, len(self.lengthEnds) - 1)]
+
+
+    def wordAt(self, position):
+        """The word at position in length order"""
+
+        offset = UINT64.unpack_from(self.index, self.offsetsStart + 8*position)[0]
+        end = self.data.find(b"\n", offset)
+        return self.data[offset:end if end >= 0 else len(self.data)].strip().upper().decode()
+
+
+    def sample(self, maxLength, k, rng=random):
+        """Returns up to k distinct random words no longer than maxLength.
+        A word on several lines can be drawn more than once, in which case
+        a limited number of replacements are drawn."""
+
+        end = self.count(maxLength)
+        k = min(k, end)
+        words = dict.fromkeys(self.wordAt(position)
+                              for position in rng.sample(range(end), k))
+        for attempt in range(4*k):
+            if len(words) == k:
+                break
+            words.setdefault(self.wordAt(rng.randrange(end)))
+        return list(words)
+
+
+_wordLists = {}
+_wordListsLock = threading.Lock()
+
+def getMappedWordList(path):
+    """Returns the process-wide MappedWordList for path, opening it on
+    first use and reopening it whenever the file has changed on disk."""
+
+    with _wordListsLock:
+        wordList = _wordLists.get(path)
+        if wordList is None or wordList.isStale():
+            wordList = _wordLists[path] = MappedWordList(path)
+        return wordList
@@ -6,10 +6,91 @@
 # Created in PyQt5
 # =============================================================================
 
+import collections
+import concurrent.futures
+import multiprocessing
+
 from PyQt5 import QtCore, QtGui, QtWidgets
-from WordSearch import WordSearch
+from Batch import buildWordSearch
+
+# =============================================================================
+# puzzlePool generates word searches in a background process, so the window
+# stays responsive, and keeps a few ready for each recently used size so a
+# new board opens instantly.
+# =============================================================================
 
-ws = WordSearch()        
+class puzzlePool(QtCore.QObject):
+    #Emitted from the executor's thread, delivered in the GUI thread
+    generated = QtCore.pyqtSignal(int, object)
+    #Emitted with an error message if generation failed
+    failed = QtCore.pyqtSignal(str)
+    
+    def __init__(self, depth=2, recentSizes=3):
+        super().__init__()
+        self.depth = depth #ready word searches to keep per size
+        self.recentSizes = recentSizes #number of sizes to keep ready
+        self.recent = [] #most recently used sizes, newest first
+        self.ready = {} #size -> deque of generated WordSearches
+        self.pending = {} #size -> number being generated
+        self.waiting = {} #size -> callbacks waiting for a WordSearch
+        
+        #Forking a process that runs Qt is unsafe, so workers are spawned
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+        self.generated.connect(self.onGenerated)
+        
+    def get(self, size, callback):
+        """Calls callback with a generated WordSearch of size, right away if
+        one is ready, otherwise once it's generated"""
+        
+        if size in self.recent:
+            self.recent.remove(size)
+        self.recent.insert(0, size)
+        for oldSize in self.recent[self.recentSizes:]:
+            self.ready.pop(oldSize, None)
+        del self.recent[self.recentSizes:]
+        
+        if self.ready.get(size):
+            callback(self.ready[size].popleft())
+        else:
+            self.waiting.setdefault(size, []).append(callback)
+        self.refill(size)
+        
+    def refill(self, size):
+        """Starts generating until size has depth word searches ready or
+        pending, beyond those already waited for"""
+        
+        wanted = len(self.waiting.get(size, ()))
+        if size in self.recent:
+            wanted += self.depth
+        while len(self.ready.get(size, ())) + self.pending.get(size, 0) < wanted:
+            self.pending[size] = self.pending.get(size, 0) + 1
+            future = self.executor.submit(buildWordSearch, size)
+            future.add_done_callback(
+                lambda future, size=size: self.generated.emit(size, future))
+            
+    def onGenerated(self, size, future):
+        self.pending[size] -= 1
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            #Give up on this size instead of retrying a failing generation
+            self.waiting.pop(size, None)
+            self.ready.pop(size, None)
+            if size in self.recent:
+                self.recent.remove(size)
+            self.failed.emit(str(future.exception()))
+            return
+        
+        if self.waiting.get(size):
+            self.waiting[size].pop(0)(future.result())
+        elif size in self.recent:
+            self.ready.setdefault(size, collections.deque()).append(future.result())
+        self.refill(size)
+        
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        
 
 # =============================================================================
 # startWindow displays on program start, allows user to enter size of word search
@@ -49,6 +130,10 @@ class startWindow(object):
 
         self.retranslateUi(MainWindow)
         QtCore.QMetaObject.connectSlotsByName(MainWindow)
+        
+        self.pool = puzzlePool()
+        self.pool.failed.connect(self.generationFailed)
+        QtWidgets.QApplication.instance().aboutToQuit.connect(self.pool.shutdown)
 
         
     def start(self):
@@ -68,9 +153,25 @@ class startWindow(object):
             self.error.show()
             return 0
         
-        #If size is valid, playWindow is displayed with word search
+        #If size is valid, playWindow is displayed once the word search is
+        #generated, which is right away if the pool has one ready
         self.error.close()
-        self.playWindow = playWindow(int(self.size.text()))
+        self.generate.setEnabled(False)
+        self.statusbar.showMessage("Generating word search...")
+        self.pool.get(int(self.size.text()), self.showWordSearch)
+        
+        
+    def generationFailed(self, message):
+        self.statusbar.showMessage("Could not generate word search: " + message)
+        self.generate.setEnabled(True)
+        
+        
+    def showWordSearch(self, ws):
+        """Called with the generated WordSearch. Displays it in playWindow."""
+        
+        self.statusbar.clearMessage()
+        self.generate.setEnabled(True)
+        self.playWindow = playWindow(ws.size, ws)
         self.playWindow.show()      
 
         
@@ -82,47 +183,153 @@ class startWindow(object):
         self.label.setText(_translate("MainWindow", "Enter a size between 10 and 55:"))
         
 
+# =============================================================================
+# letterGridModel holds the state of playWindow's word search grid: letters
+# are read straight from letterArray, and each cell's highlight is one byte
+# in cellStates rather than a table item. letterGridView draws only the
+# cells that need repainting.
+# =============================================================================
+
+#Cell states. Bit 0 is set while a letter is selected, bit 1 once it's part
+#of a found word.
+CELL_WHITE = 0
+CELL_SELECTED = 1
+CELL_FOUND = 2
+CELL_FOUND_SELECTED = 3
+
+CELL_COLORS = [QtGui.QColor('white'), QtGui.QColor(51,153,255),
+               QtGui.QColor('lightgreen'), QtGui.QColor(0,204,204)]
+
+CELL_WIDTH = 19
+CELL_HEIGHT = 17
+
+DISPLAY_ROLE = QtCore.Qt.DisplayRole
+BACKGROUND_ROLE = QtCore.Qt.BackgroundRole
+ALIGNMENT_ROLE = QtCore.Qt.TextAlignmentRole
+CENTERED = int(QtCore.Qt.AlignVCenter | QtCore.Qt.AlignHCenter)
+
+class letterGridModel(QtCore.QAbstractTableModel):
+    def __init__(self, letterArray, size):
+        super().__init__()
+        self.letterArray = letterArray
+        self.size = size
+        self.cellStates = bytearray(size*size) #row-major, all CELL_WHITE
+        
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else self.size
+    
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else self.size
+    
+    def data(self, index, role=DISPLAY_ROLE):
+        """Returns the letter, alignment or background color of a cell"""
+        
+        if role == DISPLAY_ROLE:
+            return self.letterArray[index.row()][index.column()]
+        elif role == BACKGROUND_ROLE:
+            return CELL_COLORS[self.cellStates[index.row()*self.size + index.column()]]
+        elif role == ALIGNMENT_ROLE:
+            return CENTERED
+        return None
+    
+    def cellState(self, row, col):
+        return self.cellStates[row*self.size + col]
+    
+    def setCellState(self, row, col, state):
+        """Changes the highlight of a cell and repaints just that cell"""
+        
+        self.cellStates[row*self.size + col] = state
+        index = self.index(row, col)
+        self.dataChanged.emit(index, index, [BACKGROUND_ROLE])
+        
+
+class letterGridView(QtWidgets.QTableView):
+    """Table view for letterGridModel. Painting through the model calls
+    data() for several roles per cell, so the view paints the cells in the
+    repainted area itself, reusing one QStaticText per letter."""
+    
+    def __init__(self):
+        super().__init__()
+        self.letterTexts = {} #letter -> (QStaticText, x offset, y offset)
+        
+    def letterText(self, letter):
+        if letter not in self.letterTexts:
+            metrics = self.fontMetrics()
+            self.letterTexts[letter] = (QtGui.QStaticText(letter),
+                (CELL_WIDTH - metrics.horizontalAdvance(letter))//2,
+                (CELL_HEIGHT - metrics.height())//2)
+        return self.letterTexts[letter]
+        
+    def paintEvent(self, event):
+        model = self.model()
+        rect = event.rect()
+        horizontalHeader = self.horizontalHeader()
+        verticalHeader = self.verticalHeader()
+        
+        #Range of cells overlapping the area to repaint
+        firstRow = max(0, verticalHeader.logicalIndexAt(rect.top()))
+        lastRow = verticalHeader.logicalIndexAt(rect.bottom())
+        if lastRow < 0:
+            lastRow = model.size - 1
+        firstCol = max(0, horizontalHeader.logicalIndexAt(rect.left()))
+        lastCol = horizontalHeader.logicalIndexAt(rect.right())
+        if lastCol < 0:
+            lastCol = model.size - 1
+        
+        painter = QtGui.QPainter(self.viewport())
+        painter.fillRect(rect, CELL_COLORS[CELL_WHITE])
+        for row in range(firstRow, lastRow + 1):
+            y = verticalHeader.sectionViewportPosition(row)
+            letters = model.letterArray[row]
+            for col in range(firstCol, lastCol + 1):
+                x = horizontalHeader.sectionViewportPosition(col)
+                state = model.cellStates[row*model.size + col]
+                if state != CELL_WHITE:
+                    painter.fillRect(x, y, CELL_WIDTH, CELL_HEIGHT, CELL_COLORS[state])
+                text, xOffset, yOffset = self.letterText(letters[col])
+                painter.drawStaticText(x + xOffset, y + yOffset, text)
+        painter.end()
+        
+
 # =============================================================================
 # playWindow is the main window operating the word search. After user enters a size
 # in the start window, playWindow displays generated word search and hidden word bank.
 # =============================================================================
 
 class playWindow(QtWidgets.QWidget):
-    def __init__(self, size):
+    def __init__(self, size, ws):
         super().__init__()
         self.size = size
+        self.ws = ws #generated WordSearch to play
         self.coordsToCheck = [] #stores currently selected letters to check if winning word
         self.initUI()
     
     def initUI(self):
-        """Generates word search and displays in new window"""
+        """Displays word search in new window"""
         
         self.setWindowTitle('Word Search')
         
-        ws.buildArray(self.size) #Builds sizexsize matrix of hidden words
-        
-        #Create tableWidget to store letter matrix with hidden words
-        self.tableWidget = QtWidgets.QTableWidget()
-        self.tableWidget.setColumnCount(self.size)
-        self.tableWidget.setRowCount(self.size)
-        self.tableWidget.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
-        self.tableWidget.setShowGrid(False)
-        self.tableWidget.verticalHeader().hide()
-        self.tableWidget.horizontalHeader().hide()
-        self.tableWidget.setFixedWidth(2 + 19*self.size)
-        self.tableWidget.setFixedHeight(2 + 17*self.size)
-        self.tableWidget.setVerticalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
-        self.tableWidget.setHorizontalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
-        
-        #Populate tableWidget with generated word search matrix
-        for row in range(self.size):
-            for col in range(self.size):
-                item = QtWidgets.QTableWidgetItem(ws.letterArray[row][col])
-                item.setTextAlignment(QtCore.Qt.AlignVCenter | QtCore.Qt.AlignHCenter)
-                item.setBackground(QtGui.QColor('white'))
-                self.tableWidget.setItem(row, col, item)
-                self.tableWidget.setColumnWidth(col, 19)
-                self.tableWidget.setRowHeight(row, 17)
+        ws = self.ws
+        
+        #Create tableView to display letter matrix with hidden words
+        self.gridModel = letterGridModel(ws.letterArray, self.size)
+        self.tableView = letterGridView()
+        self.tableView.setModel(self.gridModel)
+        self.tableView.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.tableView.setShowGrid(False)
+        self.tableView.verticalHeader().hide()
+        self.tableView.horizontalHeader().hide()
+        self.tableView.setFixedWidth(2 + CELL_WIDTH*self.size)
+        self.tableView.setFixedHeight(2 + CELL_HEIGHT*self.size)
+        self.tableView.setVerticalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
+        self.tableView.setHorizontalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
+        
+        #Every row and column has the same fixed size, set once for all of them
+        for header, sectionSize in ((self.tableView.horizontalHeader(), CELL_WIDTH),
+                                    (self.tableView.verticalHeader(), CELL_HEIGHT)):
+            header.setMinimumSectionSize(1)
+            header.setDefaultSectionSize(sectionSize)
+            header.setSectionResizeMode(QtWidgets.QHeaderView.Fixed)
 
         #Word bank widget to display hidden words
         self.wordsToFind = QtWidgets.QTextBrowser()
@@ -143,62 +350,63 @@ class playWindow(QtWidgets.QWidget):
         #Main widget that other widgets are added to
         self.centralWidget = QtWidgets.QGridLayout()
         self.centralWidget.addLayout(self.vBox, 0, 0)
-        self.centralWidget.addWidget(self.tableWidget, 0, 1)
+        self.centralWidget.addWidget(self.tableView, 0, 1)
         
         self.setLayout(self.centralWidget)
       
         self.show()
         
-        self.tableWidget.cellClicked.connect(self.leftClickLetter)
+        self.tableView.clicked.connect(
+            lambda index: self.leftClickLetter(index.row(), index.column()))
         
         
     def leftClickLetter(self, row, col):
-        """Called whenever a letter is clicked in tableWidget. Changes background
+        """Called whenever a letter is clicked in tableView. Changes background
         color of letter cell to indicate it's been selected, or changes background
         color back to normal if letter has been clicked again to de-select.
         Checks for winning word each time a new letter is selected."""
                
-        item = self.tableWidget.item(row, col)
+        state = self.gridModel.cellState(row, col)
         
-        if (item.background() == QtGui.QColor('white')):
-            item.setBackground(QtGui.QColor(51,153,255))
+        if state == CELL_WHITE:
+            self.gridModel.setCellState(row, col, CELL_SELECTED)
             self.coordsToCheck.append((row,col)) #adds selection to list to check for win
         
-        elif (item.background() == QtGui.QColor(51,153,255)):
-            item.setBackground(QtGui.QColor('white'))
+        elif state == CELL_SELECTED:
+            self.gridModel.setCellState(row, col, CELL_WHITE)
             self.coordsToCheck.remove((row,col)) #removes selection from list if user de-selects
             
-        elif (item.background() == QtGui.QColor('lightgreen')):
-            item.setBackground(QtGui.QColor(0,204,204))
+        elif state == CELL_FOUND:
+            self.gridModel.setCellState(row, col, CELL_FOUND_SELECTED)
             self.coordsToCheck.append((row,col))
             
-        elif (item.background() == QtGui.QColor(0,204,204)):
-            item.setBackground(QtGui.QColor('lightgreen'))
+        elif state == CELL_FOUND_SELECTED:
+            self.gridModel.setCellState(row, col, CELL_FOUND)
             self.coordsToCheck.remove((row,col))
 
         #If coordinates in coordsToCheck are a winning word, the
         #word is highlighted green
         if self.wordFoundCheck(self.coordsToCheck):
             for coordPair in self.coordsToCheck:
-                item = self.tableWidget.item(coordPair[0], coordPair[1])
-                item.setBackground(QtGui.QColor('lightGreen'))
+                self.gridModel.setCellState(coordPair[0], coordPair[1], CELL_FOUND)
             self.coordsToCheck = []
             
-        self.tableWidget.clearSelection()
+        self.tableView.clearSelection()
         
         
     def wordFoundCheck(self, coordsToCheck):
-        """Checks for win, comparing coordinates in coordsToCheck with
-        coordinates stored in WordSearch.wordLocations. If there's a win,
-        returns True and word is removed from word bank."""
-        
-        for word in ws.wordLocations:
-            if sorted(ws.wordLocations[word]) == sorted(self.coordsToCheck):
-                ws.wordsAdded.remove(word)
-                self.wordsToFind.setText('\n'.join(ws.wordsAdded))
-                self.wordsToFind.show()
-                return True
-        return False
+        """Checks for win by looking up the coordinates in coordsToCheck in
+        WordSearch's index of word locations. If there's a win, returns True
+        and word is removed from word bank."""
+        
+        word = self.ws.wordAt(coordsToCheck)
+        if word is None:
+            return False
+        
+        self.ws.markFound(word)
+        self.wordsToFind.setText('\n'.join(self.ws.wordsAdded))
+        self.wordsToFind.show()
+        return True
     
     
     def clearSelectedText(self):
@@ -206,11 +414,10 @@ class playWindow(QtWidgets.QWidget):
         are not part of a winning word are cleared on Word Search table"""
     
         for coordPair in self.coordsToCheck:
-            item = self.tableWidget.item(coordPair[0], coordPair[1])
-            if item.background() == QtGui.QColor(0,204,204):
-                item.setBackground(QtGui.QColor('lightGreen'))
+            if self.gridModel.cellState(coordPair[0], coordPair[1]) == CELL_FOUND_SELECTED:
+                self.gridModel.setCellState(coordPair[0], coordPair[1], CELL_FOUND)
             else:
-                item.setBackground(QtGui.QColor('white'))
+                self.gridModel.setCellState(coordPair[0], coordPair[1], CELL_WHITE)
     
         self.coordsToCheck = [] #selected letters removed from coordsToCheck
         
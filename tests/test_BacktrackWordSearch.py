@@ -0,0 +1,108 @@
+import random
+import time
+import unittest
+
+from BacktrackWordSearch import BacktrackWordSearch
+from WordSearch import DIRECTIONS
+
+class FixedWords:
+    """Word source that always gives the same words"""
+
+    version = "fixed"
+
+    def __init__(self, words):
+        self.words = words
+
+    def sample(self, maxLength, k, rng=random):
+        return list(self.words)
+
+
+def placements(size, word):
+    """Every in-bounds placement of word, as tuples of flat cell offsets"""
+
+    result = []
+    for rowStep, columnStep in DIRECTIONS.values():
+        for row in range(size):
+            for column in range(size):
+                endRow = row + rowStep*(len(word) - 1)
+                endColumn = column + columnStep*(len(word) - 1)
+                if 0 <= endRow < size and 0 <= endColumn < size:
+                    result.append(tuple((row + rowStep*i)*size + column + columnStep*i
+                                        for i in range(len(word))))
+    return result
+
+
+def canPlaceAll(size, words):
+    """Whether all of words fit in a size x size grid, by trying every
+    placement of every word"""
+
+    grid = [None]*(size*size)
+    options = [placements(size, word) for word in words]
+
+    def place(index):
+        if index == len(words):
+            return True
+        word = words[index]
+        for cells in options[index]:
+            if all(grid[cell] in (None, letter) for cell, letter in zip(cells, word)):
+                filled = [cell for cell in cells if grid[cell] is None]
+                for cell, letter in zip(cells, word):
+                    grid[cell] = letter
+                if place(index + 1):
+                    return True
+                for cell in filled:
+                    grid[cell] = None
+        return False
+
+    return place(0)
+
+
+class BacktrackWordSearchTest(unittest.TestCase):
+
+    def build(self, size, words, seed=0, timeBudget=10):
+        ws = BacktrackWordSearch(seed, timeBudget=timeBudget, wordSource=FixedWords(words))
+        ws.buildArray(size, verbose=False)
+        for word in ws.wordsAdded:
+            self.assertEqual("".join(ws.hiddenArray[row][column]
+                                     for row, column in ws.wordLocations[word]), word)
+        self.assertEqual(sorted(ws.wordsAdded + ws.wordsToFind), sorted(words))
+        return ws
+
+
+    def test_complete(self):
+        #Small grids and letters from a small alphabet, so that many word
+        #sets don't fit
+        rng = random.Random(0)
+        outcomes = set()
+        for case in range(150):
+            size = rng.choice((3, 4))
+            count = rng.randint(4, 6)
+            words = set()
+            while len(words) < count:
+                words.add("".join(rng.choice("ABC") for i in range(rng.randint(3, size))))
+            words = sorted(words)
+            with self.subTest(size=size, words=words):
+                ws = self.build(size, words, case)
+                expected = "placed" if canPlaceAll(size, words) else "impossible"
+                self.assertEqual(ws.searchResult, expected)
+                outcomes.add(expected)
+        self.assertEqual(outcomes, {"placed", "impossible"})
+
+
+    def test_impossible_keeps_deepest_arrangement(self):
+        ws = self.build(3, ["ABC", "DEF", "GHI", "JKL"])
+        self.assertEqual(ws.searchResult, "impossible")
+        self.assertEqual(len(ws.wordsAdded), 3)
+
+
+    def test_time_budget(self):
+        ws = BacktrackWordSearch(0, timeBudget=1)
+        start = time.perf_counter()
+        ws.buildArray(20, verbose=False, density=10)
+        self.assertEqual(ws.searchResult, "timeout")
+        self.assertLess(time.perf_counter() - start, 2)
+        self.assertTrue(ws.wordsAdded)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import tempfile
+import unittest
+
+from Batch import buildPuzzle
+from PuzzleCache import PuzzleCache, decodePuzzle, encodePuzzle
+
+class EncodingTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        for size, seed, fill in [(10, 0, "uniform"), (55, 3, "uniform"), (30, 9, "clean")]:
+            with self.subTest(size=size, seed=seed, fill=fill):
+                puzzle = buildPuzzle(size, seed, fill)
+                decoded = decodePuzzle(encodePuzzle(puzzle), seed,
+                                       puzzle.dictionaryVersion, fill)
+                self.assertEqual(decoded.asDict(), puzzle.asDict())
+                self.assertEqual(decoded.solution.cells, puzzle.solution.cells)
+                self.assertEqual(dict(decoded.locations), dict(puzzle.locations))
+
+
+    def test_not_a_cache_file(self):
+        with self.assertRaises(ValueError):
+            decodePuzzle(b"XXXX" + bytes(4))
+
+
+class PuzzleCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = PuzzleCache(self.directory.name)
+
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+
+    def test_get_put(self):
+        puzzle = buildPuzzle(20, 5)
+        self.assertIsNone(self.cache.get(20, 5))
+        self.cache.put(puzzle)
+        self.assertEqual(self.cache.get(20, 5).asDict(), puzzle.asDict())
+        self.assertIsNone(self.cache.get(20, 6))
+
+
+    def test_fill_is_part_of_the_key(self):
+        self.cache.put(buildPuzzle(30, 9, "clean"))
+        self.assertIsNone(self.cache.get(30, 9))
+        self.assertEqual(self.cache.get(30, 9, fill="clean").fill, "clean")
+        self.assertEqual(self.cache.getOrBuild(30, 9).asDict(), buildPuzzle(30, 9).asDict())
+
+
+    def test_eviction(self):
+        puzzle = buildPuzzle(20, 5)
+        cache = PuzzleCache(self.directory.name, maxBytes=2*len(encodePuzzle(puzzle)))
+        for seed in range(4):
+            cache.put(buildPuzzle(20, seed))
+        self.assertLessEqual(cache.totalBytes, cache.maxBytes)
+        self.assertIsNone(cache.get(20, 0))
+        self.assertIsNotNone(cache.get(20, 3))
+
+
+if __name__ == "__main__":
+    unittest.main()
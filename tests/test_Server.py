@@ -0,0 +1,108 @@
+import asyncio
+import json
+import unittest
+
+from Server import PuzzleServer
+from WordSearch import DIRECTIONS
+
+async def request(connection, method, target, body=b""):
+    """Sends one HTTP/1.1 request on connection, a (reader, writer) pair,
+    and returns the status, headers and decoded JSON body"""
+
+    reader, writer = connection
+    head = "{} {} HTTP/1.1\r\nHost: test\r\n".format(method, target)
+    if body:
+        head += "Content-Length: {}\r\n".format(len(body))
+    writer.write(head.encode() + b"\r\n" + body)
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line == b"\r\n":
+            break
+        name, _, value = line.decode().partition(":")
+        headers[name.lower()] = value.strip()
+    payload = await reader.readexactly(int(headers["content-length"]))
+    return status, headers, json.loads(payload)
+
+
+class PuzzleServerTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        #No ready puzzles are kept, so each /puzzle waits for one to be
+        #generated
+        self.server = PuzzleServer(depth=0, workers=1, minSize=10, maxSize=20,
+                                   maxWaiting=1, seed=0)
+        await self.server.start()
+        self.connection = await asyncio.open_connection("127.0.0.1", self.server.port)
+
+
+    async def asyncTearDown(self):
+        self.connection[1].close()
+        if self.server.server.is_serving():
+            await self.server.close()
+
+
+    async def test_puzzle(self):
+        status, headers, body = await request(self.connection, "GET", "/puzzle?size=12")
+        self.assertEqual(status, 200)
+        self.assertEqual(headers["connection"], "keep-alive")
+        self.assertEqual(body["size"], 12)
+        self.assertEqual(len(body["grid"]), 12)
+        self.assertEqual(len(body["solution"]), 12)
+        for entry in body["words"]:
+            rowStep, columnStep = DIRECTIONS[entry["direction"]]
+            letters = "".join(body["solution"][entry["row"] + rowStep*i]
+                                              [entry["column"] + columnStep*i]
+                              for i in range(len(entry["word"])))
+            self.assertEqual(letters, entry["word"])
+
+
+    async def test_errors(self):
+        for target, expected in [("/puzzle?size=5", 400), ("/puzzle", 400),
+                                 ("/puzzle?size=abc", 400), ("/nope", 404)]:
+            status, headers, body = await request(self.connection, "GET", target)
+            self.assertEqual(status, expected, target)
+            self.assertIn("error", body)
+
+
+    async def test_body_is_consumed(self):
+        status, headers, body = await request(self.connection, "POST", "/puzzle?size=12",
+                                              b'{"size": 12}\r\nGET /nope HTTP/1.1\r\n\r\n')
+        self.assertEqual(status, 405)
+        #The body wasn't taken for a request of its own
+        status, headers, body = await request(self.connection, "GET", "/metrics")
+        self.assertEqual(status, 200)
+        self.assertEqual(body["requests"], 2)
+
+
+    async def test_busy(self):
+        #Nothing is ready, and no more requests may wait for size 15
+        self.server.maxWaiting = 0
+        status, headers, body = await request(self.connection, "GET", "/puzzle?size=15")
+        self.assertEqual(status, 503)
+        self.assertEqual(self.server.generating[15], 0)
+
+        self.server.maxWaiting = 1
+        status, headers, body = await request(self.connection, "GET", "/puzzle?size=15")
+        self.assertEqual(status, 200)
+
+        status, headers, body = await request(self.connection, "GET", "/metrics")
+        self.assertEqual(body["rejected"], 1)
+        self.assertEqual(body["served"], 1)
+
+
+    async def test_close(self):
+        status, headers, body = await request(self.connection, "GET", "/metrics")
+        self.assertEqual(status, 200)
+        await self.server.close()
+        #The idle keep-alive connection is closed, and nothing is listening
+        self.assertEqual(await self.connection[0].read(), b"")
+        with self.assertRaises(OSError):
+            await asyncio.open_connection("127.0.0.1", self.server.port)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+
+from Batch import buildPuzzle
+from Solver import checkPuzzle, getSolver
+from WordIndex import getWordIndex
+from WordSearch import DIRECTIONS
+
+def bruteForce(cells, size, minLength, words):
+    """Every (word, row, column, direction) in the grid, found by reading
+    out every line from every cell. Palindromes are kept in the directions
+    findAll reads lines in."""
+
+    found = set()
+    longest = max(map(len, words))
+    for row in range(size):
+        for column in range(size):
+            for direction, (rowStep, columnStep) in DIRECTIONS.items():
+                letters = ""
+                r, c = row, column
+                while 0 <= r < size and 0 <= c < size and len(letters) < longest:
+                    letters += chr(cells[r*size + c])
+                    r += rowStep
+                    c += columnStep
+                    if (len(letters) >= minLength and letters in words and
+                        not (letters == letters[::-1] and direction in (1, 2, 3, 8))):
+                        found.add((letters, row, column, direction))
+    return found
+
+
+class SolverTest(unittest.TestCase):
+
+    def test_findAll_matches_brute_force(self):
+        words = set(getWordIndex().words)
+        solver = getSolver(3)
+        for size in (10, 17):
+            for seed in range(4):
+                with self.subTest(size=size, seed=seed):
+                    cells = buildPuzzle(size, seed).grid.cells
+                    found = solver.findAll(cells, size)
+                    self.assertEqual(len(found), len(set(found)))
+                    self.assertEqual(set(found), bruteForce(cells, size, 3, words))
+
+
+    def test_checkPuzzle_skips_hidden_words(self):
+        puzzle = buildPuzzle(20, 1)
+        result = checkPuzzle(puzzle)
+        placed = {(word,) + puzzle.locations.record(word)[:3] for word in puzzle.words}
+        for word, row, column, direction in result["extras"]:
+            self.assertNotIn((word, row, column, direction), placed)
+        for word, row, column, direction in result["duplicates"]:
+            self.assertIn(word, puzzle.words)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import itertools
+import os
+import random
+import tempfile
+import unittest
+
+from WordIndex import WordIndex
+
+
+class WordIndexQueryTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(0)
+        words = {"".join(rng.choice("ABCDEFGH") for i in range(rng.randint(1, 7)))
+                 for i in range(3000)}
+        self.directory = tempfile.TemporaryDirectory()
+        path = os.path.join(self.directory.name, "words.txt")
+        with open(path, "w") as file:
+            file.write("\n".join(words))
+        self.index = WordIndex(path)
+        self.index.addTag("some", sorted(words)[::3])
+
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+
+    def expected(self, minLength, maxLength, prefix, alphabet, sharesLetters, tag):
+        tagged = set(self.index.query(tag=tag).words) if tag else None
+        return [word for word in self.index.words
+                if minLength <= len(word) <= (maxLength or len(word))
+                and word.startswith(prefix or "")
+                and (not alphabet or set(word) <= set(alphabet))
+                and (not sharesLetters or set(word) & set(sharesLetters))
+                and (tagged is None or word in tagged)]
+
+
+    def test_letter_queries(self):
+        """Grouped letter lookups select the same words, in the same order,
+        as checking every word"""
+
+        for criteria in itertools.product(
+                [1, 3], [None, 2, 5], [None, "A", "BC"], [None, "AB", "ABCDEF"],
+                [None, "H", "AE"], [None, "some"]):
+            with self.subTest(criteria=criteria):
+                self.assertEqual(self.index.query(*criteria).words,
+                                 self.expected(*criteria))
+
+
+if __name__ == "__main__":
+    unittest.main()
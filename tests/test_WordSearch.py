@@ -0,0 +1,97 @@
+import pickle
+import unittest
+
+from Solver import checkPuzzle
+from WordSearch import DIRECTIONS, WordLocations, WordSearch
+
+class CleanFillTest(unittest.TestCase):
+
+    def test_no_word_through_a_fill_cell(self):
+        for size in (10, 25):
+            for seed in range(5):
+                ws = WordSearch(seed)
+                ws.buildArray(size, verbose=False, fill="clean")
+                with self.subTest(size=size, seed=seed):
+                    self.assertTrue(all(ws.letters))
+                    if ws.forcedCells:
+                        #A forced cell may complete a word whatever it holds
+                        continue
+                    result = checkPuzzle(ws.toPuzzle())
+                    for word, row, column, direction in result["extras"] + result["duplicates"]:
+                        rowStep, columnStep = DIRECTIONS[direction]
+                        cells = [(row + rowStep*i)*size + column + columnStep*i
+                                 for i in range(len(word))]
+                        #Words made only of hidden letters aren't the fill's
+                        self.assertTrue(all(ws.hidden[cell] for cell in cells), word)
+
+
+class WordLocationsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.ws = WordSearch(3)
+        self.ws.buildArray(30, verbose=False)
+        self.locations = self.ws.wordLocations
+
+
+    def test_round_trip(self):
+        locations = self.locations
+        self.assertEqual(list(locations), self.ws.wordsAdded)
+        for word in self.ws.wordsAdded:
+            row, column, direction, length = locations.record(word)
+            rowStep, columnStep = DIRECTIONS[direction]
+            coordPairs = [(row + rowStep*i, column + columnStep*i) for i in range(length)]
+            self.assertEqual(locations[word], coordPairs)
+            self.assertEqual("".join(self.ws.letterArray[r][c] for r, c in coordPairs), word)
+            self.assertEqual(list(locations.offsets(word)),
+                             [r*30 + c for r, c in coordPairs])
+
+        #Rebuilding from the records gives the same locations
+        copy = WordLocations(30)
+        for word in locations:
+            row, column, direction, length = locations.record(word)
+            copy.add(word, row, column, direction)
+        self.assertEqual(dict(copy), dict(locations))
+
+        restored = pickle.loads(pickle.dumps(locations))
+        self.assertEqual(dict(restored), dict(locations))
+
+
+    def test_wordsAt(self):
+        locations = self.locations
+        covered = {coordPair for word in locations for coordPair in locations[word]}
+        for row in range(30):
+            for column in range(30):
+                words = locations.wordsAt(row, column)
+                self.assertEqual(bool(words), (row, column) in covered)
+                for word in words:
+                    self.assertIn((row, column), locations[word])
+
+
+    def test_pop(self):
+        locations = self.locations
+        locations.wordsAt(0, 0) #builds the reverse index
+        words = list(locations)
+        for word in (words[-1], words[2]):
+            coordPairs = locations[word]
+            self.assertEqual(locations.pop(word), coordPairs)
+            self.assertNotIn(word, locations)
+            for row, column in coordPairs:
+                self.assertNotIn(word, locations.wordsAt(row, column))
+        remaining = [word for word in words if word in locations]
+        self.assertEqual(list(locations), remaining)
+        for word in remaining:
+            for row, column in locations[word]:
+                self.assertIn(word, locations.wordsAt(row, column))
+
+
+    def test_wordAt(self):
+        word = self.ws.wordsAdded[3]
+        coordPairs = list(reversed(self.locations[word]))
+        self.assertEqual(self.ws.wordAt(coordPairs), word)
+        self.assertIsNone(self.ws.wordAt(coordPairs[:-1]))
+        self.ws.markFound(word)
+        self.assertIsNone(self.ws.wordAt(coordPairs))
+
+
+if __name__ == "__main__":
+    unittest.main()
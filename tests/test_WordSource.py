@@ -0,0 +1,64 @@
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+from WordSource import MappedWordList, ReservoirWordList
+
+WORDS = ["cat", "dog", "bird", "horse", "ant", "zebra", "x-ray", "lion"]
+
+class MappedWordListTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "words.txt")
+        with open(self.path, "w") as file:
+            file.write("\n".join(WORDS) + "\n")
+        self.cacheHome = os.path.join(self.directory.name, "cache")
+        patcher = mock.patch.dict(os.environ, {"XDG_CACHE_HOME": self.cacheHome})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+
+    def assertSamples(self, wordList):
+        expected = sorted(word.upper() for word in WORDS if word.isalpha())
+        self.assertEqual(sorted(wordList.sample(10, 100, random.Random(0))), expected)
+        self.assertEqual(wordList.version, ReservoirWordList(self.path).version)
+
+
+    def test_index_next_to_list(self):
+        wordList = MappedWordList(self.path)
+        self.assertEqual(wordList.indexPath, self.path + ".idx")
+        self.assertSamples(wordList)
+        self.assertSamples(MappedWordList(self.path))
+
+
+    def test_damaged_index_is_rebuilt(self):
+        MappedWordList(self.path)
+        with open(self.path + ".idx", "rb") as file:
+            data = file.read()
+        for damaged in (b"", data[:10], data[:-3], b"junk" + data[4:]):
+            with self.subTest(length=len(damaged)):
+                with open(self.path + ".idx", "wb") as file:
+                    file.write(damaged)
+                self.assertSamples(MappedWordList(self.path))
+                with open(self.path + ".idx", "rb") as file:
+                    self.assertEqual(file.read(), data)
+
+
+    def test_unwritable_directory(self):
+        #A directory in the way makes the index next to the list unwritable
+        os.mkdir(self.path + ".idx")
+        wordList = MappedWordList(self.path)
+        self.assertTrue(wordList.indexPath.startswith(self.cacheHome))
+        self.assertSamples(wordList)
+        self.assertEqual(MappedWordList(self.path).indexPath, wordList.indexPath)
+
+
+if __name__ == "__main__":
+    unittest.main()